@@ -0,0 +1,252 @@
+"""
+无界面批量分析入口，对目录中的孔板图像逐一分析并将结果写入CSV
+
+用法示例：
+    python batch.py samples/tests --type miR-223 -o outputs/batch.csv
+    python batch.py plates/ --rows 8 --cols 12 --radius 0.2 --precision 4
+    python batch.py plates/ --mask circle --radius 0.45
+    python batch.py outputs --recursive --workers 8
+"""
+import argparse
+import csv
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modules.analysis import analyze_plate, guess_grid, read_image
+from modules.calibration import get_store
+from modules.record import ResultDataset
+from modules.sampler import MASK_MODES
+
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+RUN_PARAMS_FILE = '输入参数.xlsx'  # GUI保存的结果目录中记录检测参数的文件
+RUN_IMAGE_FILE = 'origin_img.jpg'  # 结果目录中的原图，其余图像（如拼接图）不是孔板
+
+DATASET_FLUSH_SIZE = 1000  # 每个数据集文件包含的图像数
+
+CSV_HEADERS = ['文件', '行号', '列号', '原始灰度', '相对灰度', '预测浓度',
+               'cx', 'cy', 'start_row', 'end_row', 'start_col', 'end_col',
+               '中位灰度', '截尾均值', '灰度标准差', '最小灰度', '最大灰度', '饱和比例']
+
+
+def iter_images(input_path, recursive=False):
+    """
+    列出输入路径下的所有图像文件（按路径排序，保证输出顺序确定）
+    :param recursive: 是否递归子目录，例如 outputs/ 下按时间戳保存的历史结果
+                      结果目录（包含 输入参数.xlsx）中只取原图 origin_img.jpg
+    """
+    if os.path.isfile(input_path):
+        return [input_path]
+
+    paths = []
+    for root, dirs, files in os.walk(input_path):
+        dirs.sort()
+        if RUN_PARAMS_FILE in files:
+            files = [entry for entry in files if entry == RUN_IMAGE_FILE]
+        for entry in sorted(files):
+            if entry.lower().endswith(IMAGE_EXTS):
+                paths.append(os.path.join(root, entry))
+        if not recursive:
+            break
+    return paths
+
+
+def read_run_params(run_dir):
+    """
+    读取历史结果目录中 输入参数.xlsx 记录的行列数、采样半径和采样形状
+    :return: (rows, cols, r, mask)，文件不存在时返回 (None, None, None, None)
+    """
+    params_path = os.path.join(run_dir, RUN_PARAMS_FILE)
+    if not os.path.exists(params_path):
+        return None, None, None, None
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(params_path, read_only=True)
+    try:
+        values = {name: value for name, value in wb.active.iter_rows(min_row=2, max_col=2, values_only=True)}
+    finally:
+        wb.close()
+    # 旧版本没有 采样形状 一行，当时只支持方形采样
+    return values.get('行数'), values.get('列数'), values.get('半径'), values.get('采样形状') or 'square'
+
+
+def analyze_file(image_path, rows=None, cols=None, r=0.2, precision=4, coefficients=None, mask='square',
+                 stats=True):
+    """
+    分析单张图像
+    :return: (结果表, 实际使用的参数, 错误信息)，成功时错误信息为 None，
+             参数为包含 rows, cols, r, mask 的字典（历史结果目录中的原图使用当时记录的参数）
+    """
+    # 单张图像出错只跳过该图像，不中断整个批次
+    try:
+        if rows is None or cols is None:
+            rows, cols = guess_grid(image_path)
+        if rows is None or cols is None:
+            # 历史结果目录中的原图使用当时记录的检测参数
+            rows, cols, run_r, run_mask = read_run_params(os.path.dirname(image_path))
+            if rows is None or cols is None:
+                return None, None, "无法从文件名推断行列数，请指定 --rows/--cols"
+            r = run_r if run_r is not None else r
+            mask = run_mask
+        if rows <= 0 or cols <= 0:
+            return None, None, f"行列数必须为正整数: {rows}x{cols}"
+
+        image = read_image(image_path)
+        if image is None:
+            return None, None, "图像读取失败"
+
+        table = analyze_plate(image, rows, cols, r, precision, coefficients, mask, stats)
+    except Exception as e:
+        return None, None, f"分析失败: {e!r}"
+    return table, {'rows': rows, 'cols': cols, 'r': r, 'mask': mask}, None
+
+
+def _init_worker():
+    """
+    子进程初始化：关闭OpenCV内部多线程，避免与进程池争抢CPU
+    """
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def _analyze_chunk(paths, params):
+    """
+    子进程任务：分析一组图像，返回 [(结果表, 实际使用的参数, 错误信息), ...]
+    """
+    return [analyze_file(path, **params) for path in paths]
+
+
+def analyze_many(paths, workers=None, chunksize=4, **params):
+    """
+    使用进程池并行分析多张图像
+    结果按输入顺序逐个产出，每完成一组即可返回，无需等待全部任务结束
+    :param paths: 图像路径列表
+    :param workers: 进程数，默认为CPU核数；为1时在当前进程串行执行
+    :param chunksize: 每个任务包含的图像数
+    :param params: 传递给 analyze_file 的分析参数
+    :return: 生成器，依次产出 (图像路径, 结果表, 实际使用的参数, 错误信息)
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= chunksize:
+        for path in paths:
+            yield (path, *analyze_file(path, **params))
+        return
+
+    chunks = [paths[k:k + chunksize] for k in range(0, len(paths), chunksize)]
+
+    # 限制同时在途的任务数，避免上万张图像一次性提交占用过多内存
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = {}
+        next_submit = 0
+        for next_yield in range(len(chunks)):
+            while next_submit < len(chunks) and len(pending) < max_pending:
+                pending[next_submit] = executor.submit(_analyze_chunk, chunks[next_submit], params)
+                next_submit += 1
+
+            results = pending.pop(next_yield).result()
+            for path, result in zip(chunks[next_yield], results):
+                yield (path, *result)
+
+
+def write_rows(writer, name, table):
+    """
+    将单张图像的结果表写入CSV
+    """
+    for info in table:
+        writer.writerow([name, info['i'] + 1, info['j'] + 1, info['avg_gray'],
+                         info['gray_diff'], info['density'], info['cx'], info['cy'],
+                         *info['box'], info['median'], info['trimmed_mean'], info['std'],
+                         info['min'], info['max'], info['saturated']])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="微孔板阵列批量分析")
+    parser.add_argument('input', help="图像文件或包含图像的目录")
+    parser.add_argument('-o', '--output', default=os.path.join('outputs', 'batch_results.csv'),
+                        help="结果CSV路径 (默认: outputs/batch_results.csv)")
+    parser.add_argument('--rows', type=int, default=None, help="行数，缺省时从文件名推断")
+    parser.add_argument('--cols', type=int, default=None, help="列数，缺省时从文件名推断")
+    parser.add_argument('--radius', type=float, default=0.2, help="采样半径比例 (默认: 0.2)")
+    parser.add_argument('--precision', type=int, default=4, help="有效数字位数 (默认: 4)")
+    parser.add_argument('--mask', choices=MASK_MODES, default='square',
+                        help="采样形状：方形采样框、内切圆或圆环 (默认: square)")
+    parser.add_argument('--no-stats', action='store_true',
+                        help="不计算中位数、标准差等稳健统计量（对应列留空），分析更快")
+    parser.add_argument('--type', dest='rna_type', default=None, help="RNA类型（curve.xlsx中的表名）")
+    parser.add_argument('--curve', default=os.path.join('arguments', 'curve.xlsx'),
+                        help="标准曲线文件 (默认: arguments/curve.xlsx)")
+    parser.add_argument('--recursive', action='store_true', help="递归处理子目录（如 outputs/ 历史结果）")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行进程数 (默认: CPU核数)")
+    parser.add_argument('--chunksize', type=int, default=4, help="每个并行任务包含的图像数 (默认: 4)")
+    parser.add_argument('--dataset', default=os.path.join('outputs', 'dataset'),
+                        help="列式数据集目录 (默认: outputs/dataset)")
+    parser.add_argument('--no-dataset', action='store_true', help="不写入列式数据集")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    paths = iter_images(args.input, args.recursive)
+    if not paths:
+        print(f"未在 {args.input} 中找到图像")
+        return 1
+
+    coefficients = None
+    if args.rna_type:
+        coefficients = get_store(args.curve).coefficients(args.rna_type)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    dataset = None if args.no_dataset else ResultDataset(args.dataset)
+    batch_id = datetime.datetime.now().strftime('batch-%Y%m%d-%H%M%S')
+    runs, wells, part = [], [], 0
+
+    start = time.perf_counter()
+    failed = 0
+    with open(args.output, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+
+        results = analyze_many(paths, args.workers, args.chunksize,
+                               rows=args.rows, cols=args.cols, r=args.radius,
+                               precision=args.precision, coefficients=coefficients, mask=args.mask,
+                               stats=not args.no_stats)
+        for path, table, used, error in results:
+            if error:
+                failed += 1
+                print(f"跳过 {path}: {error}")
+                continue
+            name = os.path.relpath(path, args.input) if os.path.isdir(args.input) else os.path.basename(path)
+            write_rows(writer, name, table)
+
+            if dataset is not None:
+                runs.append(dataset.make_run(name, used['rows'], used['cols'], used['r'], args.precision,
+                                             args.rna_type, os.path.abspath(path), mask=used['mask']))
+                wells.append(dataset.make_wells(table, run=len(runs) - 1))
+
+                # 分批写入数据集文件，避免上万张图像的结果全部驻留内存
+                if len(runs) >= DATASET_FLUSH_SIZE:
+                    dataset.append(runs, np.concatenate(wells), name=f"{batch_id}-{part:04d}")
+                    runs, wells, part = [], [], part + 1
+
+    if dataset is not None and runs:
+        dataset.append(runs, np.concatenate(wells), name=f"{batch_id}-{part:04d}")
+
+    elapsed = time.perf_counter() - start
+    print(f"完成 {len(paths) - failed}/{len(paths)} 张图像，用时 {elapsed:.2f}s，结果已保存至: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
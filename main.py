@@ -1,50 +1,112 @@
+import time
+_startup_t0 = time.perf_counter()  # 启动计时起点，需在其他导入之前
+
 from ui.MainWindow_ui import Ui_MainWindow
 from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox
-from PySide6.QtGui import QIcon
+from PySide6.QtGui import QIcon, QKeySequence, QShortcut
+from PySide6.QtCore import QEvent, QTimer
 
 import sys
-import cv2
 import os
-import pandas as pd
 
 from modules.basic import Basic
 # from modules.camera import Camera
 from modules.algorithm import Algorithm
+from modules.preview import LivePreview
 # from modules.draw import MplCanvas
 from modules.record import DataHandler
+from modules.sampler import MASK_MODES
+from modules.calibration import get_store
+from modules.startup import StartupProfiler
+from modules.state import ImageStore
+from modules.worker import JobQueue
 
 
 class MainWindow(QMainWindow):
     """
     主窗口类，用于显示图像。
     """
-    def __init__(self):
+    def __init__(self, profiler=None):
         """
         初始化主窗口，创建图像显示标签并加载显示用户选择的图像。
+        :param profiler: 启动耗时统计，可选
         """
         super().__init__()  # 调用父类构造函数
 
+        self.profiler = profiler
+        self.images = ImageStore()  # 原始图像和结果图像，供相机、界面和算法线程共享
+        self.overlay = None  # 结果图像的标注图层
+
+        # 后台任务：分析任务新提交时取消旧任务，保存任务按提交顺序依次写入
+        self.analysis_jobs = JobQueue(1)
+        self.export_jobs = JobQueue(1)
+
         self.ui = Ui_MainWindow()  # 实例化UI类
         self.ui.setupUi(self)  # 使用UI类的实例设置主窗口的界面
 
         self.argu_init()  # 参数初始化
 
-        # 初始化RNA类型选项
-        self.init_rna_types()
-
         self.basic = Basic(self)            # 图像基础操作
         # self.camera = Camera(self)          # 相机相关函数
         self.algorithm = Algorithm(self)    # 图像处理相关函数
         # self.mat = MplCanvas(self)          # Matplotlib画布
         self.handler = DataHandler(self)    # 数据存储功能
-
-        # 设置algorithm的RNA_type为当前选中的类型
-        self.algorithm.RNA_type = self.ui.type_Box.currentText()
+        self.preview = LivePreview(self)    # 参数实时预览
 
         self.slot_bind()  # 绑定槽函数
-        
-        # 设置并显示开屏默认背景及标题
-        background = cv2.imread('resources/icons/img1.jpeg')
+        self._mark("界面初始化")
+
+        # 开屏画面和标准曲线加载推迟到窗口显示之后，不阻塞启动
+        QTimer.singleShot(0, self.show_splash)
+        QTimer.singleShot(0, self.init_rna_types)
+
+    @property
+    def origin_img(self):
+        return self.images.get('origin')
+
+    @origin_img.setter
+    def origin_img(self, image):
+        self.images.set('origin', image)
+
+    @property
+    def result_img(self):
+        return self.images.get('result')
+
+    @result_img.setter
+    def result_img(self, image):
+        self.images.set('result', image)
+
+    def show_progress(self, percent, text):
+        """
+        在状态栏显示后台任务进度
+        """
+        pending = self.export_jobs.pending()
+        suffix = f"（待保存 {pending} 项）" if pending else ""
+        if percent >= 100:
+            self.statusBar().showMessage(f"{text}完成{suffix}", 3000)
+        else:
+            self.statusBar().showMessage(f"{text} {percent}%{suffix}")
+
+    def closeEvent(self, event):
+        """
+        关闭窗口时取消分析任务，并等待尚未写完的保存任务
+        """
+        self.analysis_jobs.cancel_all()
+        if self.export_jobs.pending():
+            self.statusBar().showMessage("正在等待保存任务完成...")
+            self.export_jobs.wait()
+        self.analysis_jobs.wait()
+        super().closeEvent(event)
+
+    def _mark(self, name):
+        if self.profiler is not None:
+            self.profiler.mark(name)
+
+    def show_splash(self):
+        """
+        设置并显示开屏默认背景及标题（渲染结果已缓存时只需解码一次图像）
+        """
+        background = os.path.join('resources', 'icons', 'img1.jpeg')
         title = '微孔板阵列定量比色系统'
         font = os.path.join('resources', 'fonts', '程荣光刻楷.ttf')
         font_size = 180
@@ -53,31 +115,33 @@ class MainWindow(QMainWindow):
             background, title, font, font_size, color)
 
         self.basic.display_image(screen)
+        self.ui.result_img.repaint()  # 立即绘制，不等待后续初始化
+        self._mark("开屏画面")
 
     def init_rna_types(self):
         """
         从curve.xlsx文件中读取RNA类型并设置为type_Box的选项
         """
         try:
-            excel_path = os.path.join('arguments', 'curve.xlsx')
-            if not os.path.exists(excel_path):
-                raise FileNotFoundError(f"找不到Excel文件: {excel_path}")
+            # 读取Excel文件中的所有表名（同时缓存所有表的拟合结果）
+            sheet_names = get_store().sheet_names()
             
-            # 读取Excel文件中的所有表名
-            sheet_names = pd.ExcelFile(excel_path).sheet_names
-            
-            # 清空现有的选项
+            # 填充选项期间屏蔽信号，避免clear()触发空类型的曲线读取
+            self.ui.type_Box.blockSignals(True)
             self.ui.type_Box.clear()
-            
-            # 添加表名作为选项
             self.ui.type_Box.addItems(sheet_names)
+            self.ui.type_Box.blockSignals(False)
             
-            # 注意：此时self.algorithm还未创建，不能设置self.algorithm.RNA_type
+            # 设置algorithm的RNA_type为当前选中的类型
+            self.algorithm.argu_update_rna_type()
             
         except Exception as e:
             # 弹窗报错
             QMessageBox.critical(self, "错误", f"无法读取curve.xlsx文件中的RNA类型:\n{str(e)}")
-            sys.exit(1)
+            QApplication.exit(1)
+            return
+
+        self._mark("标准曲线")
 
 
     def argu_init(self):
@@ -85,11 +149,13 @@ class MainWindow(QMainWindow):
         self.ui.cols_Slider.setValue(1)
         self.ui.r_Slider.setValue(5)
         self.ui.precision_Slider.setValue(3)
+        self.ui.mask_Box.setCurrentIndex(0)
 
         self.argu_update_rows()
         self.argu_update_cols()
         self.argu_update_r()
         self.argu_update_precision()
+        self.argu_update_mask()
 
     def argu_update_rows(self):
         self.rows = self.ui.rows_Slider.value()
@@ -107,6 +173,9 @@ class MainWindow(QMainWindow):
         self.precision = self.ui.precision_Slider.value()
         self.ui.precision_label.setText(str(self.precision))
 
+    def argu_update_mask(self):
+        self.mask = MASK_MODES[self.ui.mask_Box.currentIndex()]
+
 
     def slot_bind(self):
         """
@@ -122,36 +191,58 @@ class MainWindow(QMainWindow):
 
         # self.ui.capture_button.clicked.connect(self.camera.toggle_thread)
 
-        # 滑块更新相关槽函数
-        self.ui.rows_Slider.sliderReleased.connect(self.argu_update_rows)
-        self.ui.rows_Slider.sliderMoved.connect(self.argu_update_rows)
-        self.ui.rows_Slider.valueChanged.connect(self.argu_update_rows)
+        # 首次计数后开启参数实时预览
+        self.ui.count_button.clicked.connect(self.preview.activate)
 
-        self.ui.cols_Slider.sliderReleased.connect(self.argu_update_cols)
-        self.ui.cols_Slider.sliderMoved.connect(self.argu_update_cols)
+        # 滑块更新相关槽函数（拖动时 valueChanged 已逐值触发，无需再连接 sliderMoved/sliderReleased）
+        self.ui.rows_Slider.valueChanged.connect(self.argu_update_rows)
         self.ui.cols_Slider.valueChanged.connect(self.argu_update_cols)
-
-        self.ui.r_Slider.sliderReleased.connect(self.argu_update_r)
-        self.ui.r_Slider.sliderMoved.connect(self.argu_update_r)
         self.ui.r_Slider.valueChanged.connect(self.argu_update_r)
-
-        self.ui.precision_Slider.sliderReleased.connect(self.argu_update_precision)
-        self.ui.precision_Slider.sliderMoved.connect(self.argu_update_precision)
         self.ui.precision_Slider.valueChanged.connect(self.argu_update_precision)
+        self.ui.mask_Box.currentIndexChanged.connect(self.argu_update_mask)
 
         self.ui.type_Box.currentIndexChanged.connect(self.algorithm.argu_update_rna_type)
 
+        # 网格参数变化时立即重绘预览，其余参数只推迟完整分析
+        self.ui.rows_Slider.valueChanged.connect(self.preview.request)
+        self.ui.cols_Slider.valueChanged.connect(self.preview.request)
+        self.ui.r_Slider.valueChanged.connect(self.preview.request)
+        self.ui.mask_Box.currentIndexChanged.connect(self.preview.request)
+        self.ui.precision_Slider.valueChanged.connect(self.preview.schedule)
+        self.ui.type_Box.currentIndexChanged.connect(self.preview.schedule)
+
+        # L 键切换各孔文本标注的显示
+        QShortcut(QKeySequence("L"), self, self.basic.toggle_labels)
+
+        # 双击结果图像打开大图查看窗口
+        self.ui.result_img.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.ui.result_img and event.type() == QEvent.Type.MouseButtonDblClick:
+            self.basic.open_viewer()
+            return True
+        return super().eventFilter(obj, event)
+
 # ... existing code ...
 
 if __name__ == "__main__":
+    # 使用 --startup-report 参数运行时打印启动耗时报告
+    profiler = StartupProfiler(_startup_t0)
+    profiler.mark("模块导入")
+
     # 创建 QApplication 实例
     app = QApplication(sys.argv)
     icon = os.path.join('resources', 'icons', 'split.png')
     app.setWindowIcon(QIcon(icon))
+    profiler.mark("QApplication")
 
     # 创建主窗口并显示
-    main_window = MainWindow()
+    main_window = MainWindow(profiler)
     main_window.show()
+    profiler.mark("窗口显示")
+
+    if '--startup-report' in sys.argv:
+        QTimer.singleShot(0, profiler.report)
 
     # 运行应用程序
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -1,8 +1,14 @@
 import cv2
-import numpy as np
 import os
 import datetime
-import pandas as pd
+
+from modules.analysis import AnalysisPipeline, analyze_plate, read_image
+from modules.calibration import get_store
+from modules.export import IMAGES_THUMBNAIL, write_results_workbook
+from modules.index import ResultIndex
+from modules.overlay import Overlay, draw_text, grid_overlay
+from modules.record import ResultDataset
+from modules.sampler import MosaicBuilder
 
 class Algorithm:
     def __init__(self, main_window=None):
@@ -11,6 +17,8 @@ class Algorithm:
         self.data = []
         self.RNA_type = None
         self.coefficients = None
+        self.pipeline = AnalysisPipeline()  # 分阶段缓存的分析流程
+        self.mosaic_builder = MosaicBuilder()  # 拼接图构建器，复用坐标映射和输出缓冲区
 
         if main_window is not None:
             self.main_window = main_window
@@ -18,84 +26,58 @@ class Algorithm:
             self.cols = self.main_window.cols
             self.r = self.main_window.r
             self.precision = self.main_window.precision
-
-            self.argu_update_rna_type()
+            self.mask = self.main_window.mask
+            # 标准曲线在窗口显示后由 MainWindow.init_rna_types 填充类型列表时读取
 
         else:
             self.rows = 4
             self.cols = 6
             self.r = 0.2
             self.precision = 4
+            self.mask = 'square'
             
     def _draw_text_on_image(self, image, text_lines, position, max_width=None, color=(0, 0, 0), thickness=1):
         """
-        在图像上绘制文本，自动调整字体大小以适应指定宽度
+        在图像上绘制文本，自动调整字体大小以适应指定宽度，详见 modules.overlay.draw_text
         """
-        x, y, width, height = position
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        
-        # 动态字体计算
-        base_scale = 0.004
-        text_scale = min(width, height) * base_scale
-        text_scale = max(0.3, min(text_scale, 1.0))
-        
-        # 获取文本尺寸
-        line_heights = []
-        line_widths = []
-        baselines = []
-        for line in text_lines:
-            (text_w, text_h), baseline = cv2.getTextSize(line, font, text_scale, thickness)
-            line_widths.append(text_w)
-            line_heights.append(text_h)
-            baselines.append(baseline)
-            
-        max_line_width = max(line_widths) if line_widths else 0
-        max_line_height = max(line_heights) if line_heights else 0
-        baseline = baselines[0] if baselines else 0
-        
-        # 自动调整大小以适应宽度
-        if max_width and max_line_width > max_width:
-            text_scale *= max_width / max_line_width
-            text_scale = max(0.2, min(text_scale, 1.0))
-            
-            # 重新计算尺寸
-            line_heights = []
-            line_widths = []
-            for line in text_lines:
-                (text_w, text_h), _ = cv2.getTextSize(line, font, text_scale, thickness)
-                line_widths.append(text_w)
-                line_heights.append(text_h)
-            max_line_width = max(line_widths) if line_widths else 0
-            max_line_height = max(line_heights) if line_heights else 0
-            
-        # 高度验证
-        max_text_height = height * 0.3
-        if (max_line_height + baseline) * len(text_lines) > max_text_height and len(text_lines) > 0:
-            text_scale *= max_text_height / ((max_line_height + baseline) * len(text_lines))
-            text_scale = max(0.2, min(text_scale, 1.0))
-            
-        # 精确居中定位
-        total_text_height = (max_line_height + baseline) * len(text_lines) - baseline if len(text_lines) > 0 else 0
-        text_y_base = y + (height + total_text_height) // 2
-        
-        # 边界保护
-        text_y_base = min(y + height - baseline - 5, max(y + max_line_height + 5, text_y_base))
-        
-        # 逐行绘制
-        for idx, line in enumerate(text_lines):
-            text_x = x + (width - cv2.getTextSize(line, font, text_scale, thickness)[0][0]) // 2
-            text_y = text_y_base + idx * (max_line_height + baseline) if max_line_height > 0 else 0
-            cv2.putText(image, line, (text_x, text_y),
-                        font, text_scale, color, thickness, cv2.LINE_AA)
+        draw_text(image, text_lines, position, max_width, color, thickness)
+
+    def _source_path(self):
+        """
+        返回当前分析图像的路径，无路径（如相机采集）时返回 None
+        """
+        return getattr(getattr(self, 'main_window', None), 'image_path', None) or self.image_path
 
-    def save_detection_data(self, output_dir, original_image_path):
+    def snapshot(self, image=None):
+        """
+        记录当前分析参数、图像及其路径
+        后台分析和保存使用该快照，不受界面上随后修改参数或加载下一块孔板的影响
+        """
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'r': self.r,
+            'precision': self.precision,
+            'mask': self.mask,
+            'stats': True,  # 是否计算稳健统计量
+            'RNA_type': self.RNA_type,
+            'coefficients': self.coefficients,
+            'source': self._source_path(),
+            'image': image,
+        }
+
+    def save_detection_data(self, output_dir, original_image_path, params=None):
         """
         保存检测参数和原始图片到输出文件夹，并生成记录参数的Excel表格
+        :param params: 分析时的参数快照（见 snapshot），默认使用当前参数和图像
         """
+        if params is None:
+            params = self.snapshot(getattr(getattr(self, 'main_window', None), 'origin_img', None))
+
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
-        if hasattr(self, 'main_window') and hasattr(self.main_window, 'origin_img'):
-            cv2.imwrite(os.path.join(output_dir, 'origin_img.jpg'), self.main_window.origin_img)
+        if params['image'] is not None:
+            cv2.imwrite(os.path.join(output_dir, 'origin_img.jpg'), params['image'])
         elif original_image_path and os.path.exists(original_image_path):
             origin_img = cv2.imread(original_image_path)
             cv2.imwrite(os.path.join(output_dir, 'origin_img.jpg'), origin_img)
@@ -130,24 +112,32 @@ class Algorithm:
             
             # 行列数参数
             ws.cell(row=row_index, column=1, value="行数").alignment = center_alignment
-            ws.cell(row=row_index, column=2, value=self.rows).alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=params['rows']).alignment = center_alignment
             row_index += 1
             
             ws.cell(row=row_index, column=1, value="列数").alignment = center_alignment
-            ws.cell(row=row_index, column=2, value=self.cols).alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=params['cols']).alignment = center_alignment
             row_index += 1
             
             ws.cell(row=row_index, column=1, value="半径").alignment = center_alignment
-            ws.cell(row=row_index, column=2, value=self.r).alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=params['r']).alignment = center_alignment
             row_index += 1
             
             ws.cell(row=row_index, column=1, value="精度").alignment = center_alignment
-            ws.cell(row=row_index, column=2, value=self.precision).alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=params['precision']).alignment = center_alignment
+            row_index += 1
+
+            ws.cell(row=row_index, column=1, value="采样形状").alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=params['mask']).alignment = center_alignment
             row_index += 1
             
             # RNA类型和拟合曲线
             ws.cell(row=row_index, column=1, value="类型").alignment = center_alignment
-            ws.cell(row=row_index, column=2, value=self.RNA_type if self.RNA_type else "未指定").alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=params['RNA_type'] if params['RNA_type'] else "未指定").alignment = center_alignment
+            row_index += 1
+            
+            ws.cell(row=row_index, column=1, value="图像").alignment = center_alignment
+            ws.cell(row=row_index, column=2, value=original_image_path or params['source']).alignment = center_alignment
             row_index += 1
             
             
@@ -158,130 +148,83 @@ class Algorithm:
         except Exception as e:
             print(f"保存检测参数失败: {str(e)}")
             
-    def save_results(self, output_dir, stitched_img, sub_image_info):
+    def save_results(self, output_dir, stitched_img, sub_image_info, images=IMAGES_THUMBNAIL, params=None,
+                     progress=None):
         """
-        保存处理结果，包括图片和Excel数据
+        保存处理结果，包括图片和Excel数据，不涉及界面操作，可在后台线程中调用
+        :param images: Excel中子图的嵌入模式（原图 / 缩略图 / 不嵌入），见 modules.export
+        :param params: 分析时的参数快照（见 snapshot），默认使用当前参数
+        :param progress: 进度回调 progress(百分比, 说明)，可选
         """
+        if params is None:
+            params = self.snapshot()
+        report = progress or (lambda percent, text='': None)
+
         os.makedirs(output_dir, exist_ok=True)
         if stitched_img is not None:
             cv2.imwrite(os.path.join(output_dir, 'result_img.jpg'), stitched_img)
         
+        report(40, "写入Excel")
         try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, Alignment
-            from openpyxl.drawing.image import Image as XLImage
-            from PIL import Image
-            import io
-            import math
-            
-            wb = Workbook()
-            
-            # 创建一个包含所有数据的工作表
-            ws1 = wb.active
-            ws1.title = "详细检测数据"
-            
-            # 创建居中对齐样式
-            center_alignment = Alignment(horizontal="center", vertical="center")
-            
-            # 写入表头
-            headers = ['行号', '列号', '原始灰度', '相对灰度', '预测浓度', 'lg(浓度)', '原始子图']
-            for col, header in enumerate(headers, 1):
-                cell = ws1.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-                cell.alignment = center_alignment
-            
-            # 写入详细数据 - 按照您的要求，按行优先顺序排列
-            for idx, info in enumerate(sub_image_info):
-                # 每一行的数据连续排列，然后换行
-                row = idx + 2  # 第一行是表头，所以数据从第二行开始
-                
-                # 计算log10(浓度)
-                density = info['density']
-                log_density = math.log10(density) if density > 0 else 0
-                
-                # 写入数据并居中对齐
-                ws1.cell(row=row, column=1, value=info['i'] + 1).alignment = center_alignment  # 行号（从1开始）
-                ws1.cell(row=row, column=2, value=info['j'] + 1).alignment = center_alignment  # 列号（从1开始）
-                ws1.cell(row=row, column=3, value=info['avg_gray']).alignment = center_alignment  # 原始灰度值
-                ws1.cell(row=row, column=4, value=info['gray_diff']).alignment = center_alignment  # 相对灰度值
-                ws1.cell(row=row, column=5, value=info['density']).alignment = center_alignment  # 预测浓度
-                ws1.cell(row=row, column=6, value=log_density).alignment = center_alignment  # log10(浓度)
-
-                # 插入子图
-                sub_image = info['sub_image']
-                if sub_image is not None:
-                    # 将OpenCV图像转换为PIL图像
-                    sub_image_rgb = cv2.cvtColor(sub_image, cv2.COLOR_BGR2RGB)
-                    pil_image = Image.fromarray(sub_image_rgb)
-                    
-                    # 将PIL图像保存到内存中的字节流
-                    image_stream = io.BytesIO()
-                    pil_image.save(image_stream, format='PNG')
-                    image_stream.seek(0)
-                    
-                    # 创建Excel图像对象
-                    img = XLImage(image_stream)
-                    
-                    # 调整图像大小
-                    img.width = 80
-                    img.height = 80
-                    
-                    # 插入图像到单元格
-                    # 使用标准方法添加图片到指定单元格
-                    img.anchor = f'G{row}'  # G列是原始子图列
-                    ws1.add_image(img)
-
-            # 设置列宽
-            ws1.column_dimensions['A'].width = 8   # "行号"列宽为5字符
-            ws1.column_dimensions['B'].width = 8   # "列号"列宽为5字符
-            ws1.column_dimensions['C'].width = 12  # "原始灰度"列宽为12字符
-            ws1.column_dimensions['D'].width = 12  # "相对灰度"列宽为12字符
-            ws1.column_dimensions['E'].width = 16  # "预测浓度"列宽为15字符
-            ws1.column_dimensions['F'].width = 16  # "log10(浓度)"列宽为12字符
-            ws1.column_dimensions['G'].width = 12  # "原始子图"列宽为12字符
-            
-            # 设置行高
-            ws1.row_dimensions[1].height = 30  # 第一行表头行高为30
-            for row in range(2, len(sub_image_info) + 2):  # 数据行
-                ws1.row_dimensions[row].height = 60  # 设置行高以便显示图像
-
-            # 创建新的工作表来记录系数
-            if hasattr(self, 'coefficients') and self.coefficients is not None:
-
-                bold_font = Font(bold=True)
-
-                coeff_ws = wb.create_sheet("标曲拟合系数")
-                coeff_ws.column_dimensions['A'].width = 15
-                coeff_ws.column_dimensions['B'].width = 20
-                
-                # 标题行
-                coeff_ws.cell(row=1, column=1, value="系数项").font = bold_font
-                coeff_ws.cell(row=1, column=1).alignment = center_alignment
-                coeff_ws.cell(row=1, column=2, value="系数值").font = bold_font
-                coeff_ws.cell(row=1, column=2).alignment = center_alignment
-                
-                # 写入系数数据
-                coeff_names = ["x^5", "x^4", "x^3", "x^2", "x^1", "x^0"]
-                for i, (name, coeff) in enumerate(zip(coeff_names, self.coefficients)):
-                    coeff_ws.cell(row=i+2, column=1, value=name).alignment = center_alignment
-                    coeff_ws.cell(row=i+2, column=2, value=coeff).alignment = center_alignment
-            
-            wb.save(os.path.join(output_dir, '检测结果.xlsx'))
-            print(f"Excel已保存至: {os.path.join(output_dir, '检测结果.xlsx')}")
+            excel_path = os.path.join(output_dir, '检测结果.xlsx')
+            write_results_workbook(excel_path, sub_image_info, params['coefficients'], images=images)
+            print(f"Excel已保存至: {excel_path}")
         except Exception as e:
             print(f"Excel保存失败: {str(e)}")
-        
-        # 关闭预览窗口
-        if hasattr(self, 'preview_window'):
+
+        # 同时写入列式数据集，便于跨批次快速查询
+        report(80, "写入数据集")
+        try:
+            dataset = ResultDataset()
+            run = dataset.make_run(os.path.basename(output_dir), params['rows'], params['cols'], params['r'],
+                                   params['precision'], params['RNA_type'], params['source'],
+                                   mask=params['mask'])
+            dataset.append(run, dataset.make_wells(sub_image_info))
+        except Exception as e:
+            print(f"数据集写入失败: {str(e)}")
+
+        # 登记到结果索引
+        try:
+            ResultIndex().record_run(output_dir, params['rows'], params['cols'], params['r'], params['precision'],
+                                     params['RNA_type'], sub_image_info, params['source'], params['mask'])
+        except Exception as e:
+            print(f"结果索引更新失败: {str(e)}")
+        return output_dir
+
+    def export(self, output_dir, stitched_img, sub_image_info, params, progress=None):
+        """
+        保存检测参数、原图和处理结果（保存任务的完整流程）
+        """
+        report = progress or (lambda percent, text='': None)
+        report(10, "保存检测参数")
+        self.save_detection_data(output_dir, params['source'], params)
+        return self.save_results(output_dir, stitched_img, sub_image_info, params=params, progress=progress)
+
+    def save_in_background(self, output_dir, stitched_img, sub_image_info, params):
+        """
+        将保存任务加入后台队列（按提交顺序依次写入），立即关闭预览窗口，
+        操作员可以继续分析下一块孔板
+        """
+        if getattr(self, 'preview_window', None) is not None:
             self.preview_window.close()
-            
-        # 询问是否打开输出目录
+
+        self.main_window.export_jobs.submit(
+            self.export, output_dir, stitched_img, sub_image_info, params,
+            name="保存结果",
+            on_done=self.show_saved,
+            on_error=lambda error: self.main_window.statusBar().showMessage(f"保存失败: {error}"),
+            on_progress=self.main_window.show_progress)
+
+    def show_saved(self, output_dir):
+        """
+        保存完成后询问是否打开输出目录
+        """
         try:
             from PySide6.QtWidgets import QMessageBox
             msg_box = QMessageBox()
             msg_box.setWindowTitle("保存完成")
             msg_box.setText("结果已保存成功！")
-            msg_box.setInformativeText("是否要打开输出目录？")
+            msg_box.setInformativeText(f"{output_dir}\n是否要打开输出目录？")
             msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
             msg_box.setDefaultButton(QMessageBox.Yes)
             
@@ -313,18 +256,9 @@ class Algorithm:
         # 默认系数防止未定义情况
         self.coefficients = None
             
-        # 从Excel文件读取数据
+        # 从标准曲线缓存中读取数据（Excel仅在修改后重新解析）
         try:
-            excel_path = os.path.join('arguments', 'curve.xlsx')
-            if not os.path.exists(excel_path):
-                raise FileNotFoundError(f"找不到Excel文件: {excel_path}")
-            
-            # 读取对应的sheet
-            df = pd.read_excel(excel_path, sheet_name=self.RNA_type)
-            
-            # 提取x和y列数据
-            x = df['相对灰度'].values
-            y = df['lg(浓度)'].values
+            x, y, coefficients = get_store().curve(self.RNA_type)
             
         except Exception as e:
             # 弹窗报错并退出
@@ -347,8 +281,8 @@ class Algorithm:
         for i, (x_val, y_val) in enumerate(zip(x, y)):
             print(f"  point_{i+1}: diff={x_val}, lg(c)={y_val}")
         
-        # 拟合标准曲线（最后的参数为需要拟合的次数）
-        self.coefficients = np.polyfit(x, y, 5)
+        # 标准曲线（5次多项式）已在缓存中拟合完成
+        self.coefficients = coefficients
 
         # 显示系数的矩阵形式
         coeffs_formatted = [f"{coef:.3g}" for coef in self.coefficients]
@@ -371,233 +305,268 @@ class Algorithm:
         # print(" + ".join(terms).replace("+ -", "- "))
 
         
-    def count(self, main_window=None):
-        # 初始化参数
-        if main_window is not None:
-            self.rows = self.main_window.rows
-            self.cols = self.main_window.cols
-            self.r = self.main_window.r
-            self.precision = self.main_window.precision
-            image = self.main_window.origin_img.copy()
-        else:
-            if self.image_path is None:
-                print("错误：未提供图像路径")
-                return
-            image = cv2.imread(self.image_path)
-            if image is None:
-                print(f"错误：无法读取图像 {self.image_path}")
-                return
+    def show_preview(self, stitched_img, sub_image_info, params=None):
+        """
+        显示拼接结果预览窗口，并询问是否保存
+        :param params: 分析时的参数快照（见 snapshot），保存时使用
+        """
+        if params is None:
+            params = self.snapshot(self.main_window.origin_img)
 
-        height, width = image.shape[:2]
-        row_height = height // self.rows
-        col_width = width // self.cols
+        # 关闭上一次分析的预览窗口
+        if getattr(self, 'preview_window', None) is not None:
+            self.preview_window.close()
 
-        # 绘制基础网格线
-        for i in range(1, self.rows):
-            cv2.line(image, (0, i*row_height), (width, i*row_height), (255,0,0), 2)
-        for j in range(1, self.cols):
-            cv2.line(image, (j*col_width, 0), (j*col_width, height), (255,0,0), 2)
+        timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output_dir = os.path.join('outputs', timestamp)
+        
+        # 弹窗询问是否保存结果
+        try:
+            from PySide6.QtWidgets import QMessageBox, QLabel, QVBoxLayout, QWidget, QPushButton, QHBoxLayout
+            from PySide6.QtGui import QPixmap, QImage
+            from PySide6.QtCore import Qt
+            
+            # 创建预览窗口
+            preview_window = QWidget()
+            preview_window.setWindowTitle('结果预览')
+            preview_window.resize(800, 650)
+            
+            # 创建布局
+            layout = QVBoxLayout()
+            
+            # 创建标签用于显示图片
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            
+            # 转换拼接图像以进行预览
+            if stitched_img is not None:
+                # 转换颜色格式 (OpenCV是BGR,需要转换为RGB)
+                img_rgb = cv2.cvtColor(stitched_img, cv2.COLOR_BGR2RGB)
+                
+                # 转换为QImage
+                h, w, ch = img_rgb.shape
+                bytes_per_line = ch * w
+                q_img = QImage(img_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
+                
+                # 转换为QPixmap并适应窗口大小
+                pixmap = QPixmap.fromImage(q_img)
+                label.setPixmap(pixmap.scaled(780, 500, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            
+            layout.addWidget(label)
+            
+            # 添加提示信息
+            info_label = QLabel("是否要保存结果？")
+            info_label.setAlignment(Qt.AlignCenter)
+            info_label.setWordWrap(True)
+            layout.addWidget(info_label)
 
-        # 初始化拼接图像参数
-        sub_h = int(row_height * 2 * self.r)
-        sub_w = int(col_width * 2 * self.r)
-        stitched_img = np.full((sub_h*self.rows, sub_w*self.cols, 3), 255, dtype=np.uint8)
-        self.data = []
+            # 添加按钮布局
+            button_layout = QHBoxLayout()
+            
+            # 确认保存按钮
+            save_button = QPushButton("保存")
+            save_button.clicked.connect(
+                lambda: self.save_in_background(output_dir, stitched_img, sub_image_info, params))
+            
+            # 取消按钮
+            cancel_button = QPushButton("取消")
+            cancel_button.clicked.connect(preview_window.close)
+
+            
+            button_layout.addWidget(save_button)
+            button_layout.addWidget(cancel_button)
+            
+            layout.addLayout(button_layout)
+            preview_window.setLayout(layout)
+            preview_window.show()
+            
+            # 保存窗口引用以防止被垃圾回收
+            self.preview_window = preview_window
+            
+        except Exception as e:
+            print(f"预览窗口创建失败: {e}")
+
+    def update_params(self):
+        """
+        从主窗口同步分析参数
+        """
+        self.rows = self.main_window.rows
+        self.cols = self.main_window.cols
+        self.r = self.main_window.r
+        self.precision = self.main_window.precision
+        self.mask = self.main_window.mask
+
+    def process(self, image, params=None, progress=None):
+        """
+        分析图像并生成标注图层，不涉及任何界面操作，可在后台线程中调用
+        各阶段结果按输入缓存，只修改精度或RNA类型时不会重新采样、裁剪和拼接
+        :param image: BGR图像（不会被修改）
+        :param params: 参数快照（见 snapshot），默认使用当前参数
+        :param progress: 进度回调 progress(百分比, 说明)，可选
+        :return: (标注图层, 拼接图像, 子图信息)，未找到子图时返回 None
+                 标注不写入图像像素，显示时叠加绘制，保存时使用 Overlay.rasterize
+        """
+        # 固定本次分析使用的参数，避免分析过程中被界面线程修改
+        if params is None:
+            params = self.snapshot()
+        rows, cols, r, precision = params['rows'], params['cols'], params['r'], params['precision']
+        coefficients, mask = params['coefficients'], params['mask']
+        report = progress or (lambda percent, text='': None)
+
+        # 网格几何 → 孔采样 → 标定 → 结果表
+        report(10, "采样")
+        pipeline = self.pipeline
+        grid, sub_image_info, key = pipeline.run(image, rows, cols, r, precision, coefficients, mask,
+                                                 stats=params['stats'])
 
-        # 存储每个子图的信息
-        sub_image_info = []
-
-        # ========== 第一次循环：计算所有子图的灰度值并存储 ==========
-        for i in range(self.rows):
-            for j in range(self.cols):
-                # 计算中心坐标和采样区域
-                cx = j * col_width + col_width // 2
-                cy = i * row_height + row_height // 2
-                radius = int(min(row_height, col_width) * self.r)
-
-                # 裁剪子图
-                start_row = max(cy - radius, 0)
-                end_row = min(cy + radius, height)
-                start_col = max(cx - radius, 0)
-                end_col = min(cx + radius, width)
-                sub_image = image[start_row:end_row, start_col:end_col]
-
-                # 调整子图尺寸
-                sub_image = cv2.resize(sub_image, (sub_w, sub_h))
-
-                # 计算灰度值
-                gray = cv2.cvtColor(sub_image, cv2.COLOR_BGR2GRAY)
-                avg_gray = float(f"{cv2.mean(gray)[0]:.{self.precision}g}")
-
-                # 保存子图信息
-                sub_image_info.append({
-                    'i': i,
-                    'j': j,
-                    'cx': cx,
-                    'cy': cy,
-                    'sub_image': sub_image.copy(),
-                    'avg_gray': avg_gray,
-                    'box': (start_row, end_row, start_col, end_col)  # 原图采样框坐标
-                })
-
-        # ========== 找到最大灰度值 ==========
         if not sub_image_info:
             print("错误：未找到任何子图像")
-            return
-            
-        max_gray = max(info['avg_gray'] for info in sub_image_info)
+            return None
+
+        # 网格线和采样区域图层只取决于网格几何和采样形状
+        source, geometry = key[0], key[0][1]
+        grid_layer = pipeline.stage('grid_overlay', (geometry, mask), lambda: grid_overlay(grid, mask=mask))
+
+        # 只取决于图像和网格的阶段：各孔子图直接缩放写入拼接图缓冲区，
+        # 结果表中的子图均为该缓冲区的视图，不再单独保存副本
+        report(50, "裁剪子图")
+        mosaic = pipeline.stage('mosaic', source, lambda: self._stitch(image, grid))
+        sub_image_info = sub_image_info.with_mosaic(mosaic, grid.sub_h, grid.sub_w)
+
+        # 文本标注
+        report(80, "标注")
+        text_layer, stitched_img = pipeline.stage(
+            'annotate', key, lambda: self._annotate(mosaic, grid, sub_image_info, precision))
+        return grid_layer + text_layer, stitched_img, sub_image_info
+
+    def _stitch(self, image, grid):
+        """
+        将各孔采样区域缩放后按行列位置拼接，详见 MosaicBuilder
+        """
+        return self.mosaic_builder.build(image, grid)
+
+    def _annotate(self, mosaic, grid, sub_image_info, precision):
+        """
+        生成原图的文本标注图层，并在拼接图副本上绘制各孔的检测结果文本
+        :return: (文本图层, 拼接图像)
+        """
+        overlay = Overlay()
+        stitched_img = mosaic.copy()
+        sub_h = grid.sub_h
+        sub_w = grid.sub_w
 
-        # ========== 第二次循环：计算灰度变化量并标注 ==========
         for info in sub_image_info:
             i = info['i']
             j = info['j']
             cx = info['cx']
             cy = info['cy']
-            sub_image = info['sub_image'].copy()
-            avg_gray = info['avg_gray']
-
-            # 计算灰度变化量
-            gray_diff = max_gray - avg_gray
-
-            # 计算预测浓度
-            if gray_diff != 0 and self.coefficients is not None:
-                density = 10**np.polyval(self.coefficients, gray_diff)
-            else:
-                density = 0
-
-            # 将density转换为 a*10^b 的形式
-            import math
-            if density > 0:
-                exponent = math.floor(math.log10(density))
-                mantissa = density / (10 ** exponent)
-                if exponent == 0:
-                    density_str = f"{mantissa:.{self.precision-1}g}"
-                else:
-                    density_str = f"{mantissa:.{self.precision-1}g}*10^{exponent}"
-            else:
-                density_str = "0"
 
             text_lines = [
-                f"Avg: {avg_gray:.{self.precision}g}",
-                f"Diff: {gray_diff:.{self.precision}g}",
-                f"Density: {density_str}"
+                f"Avg: {info['avg_gray']:.{precision}g}",
+                f"Diff: {info['gray_diff']:.{precision}g}",
+                f"Density: {info['density_str']}"
             ]
-            
-            # 更新子图信息，添加相对灰度值和预测浓度
-            info.update({
-                'gray_diff': gray_diff,
-                'density': density,
-                'density_str': density_str
-            })
 
-            # ========== 子图文本绘制 ==========
+            # ========== 子图文本绘制（直接绘制在拼接图对应区域的视图上） ==========
+            sub_image = stitched_img[i * sub_h:(i + 1) * sub_h, j * sub_w:(j + 1) * sub_w]
             self._draw_text_on_image(sub_image, text_lines, (0, 0, sub_w, sub_h), 
                                    max_width=sub_w * 0.8, color=(0, 0, 0), thickness=1)
 
-            # 放入拼接图
-            stitched_img[i * sub_h:(i + 1) * sub_h, j * sub_w:(j + 1) * sub_w] = sub_image
-
             # ========== 原始图像标注 ==========
-            start_row, end_row, start_col, end_col = info['box']
             box_tl_x = int(cx - sub_w / 2)
             box_tl_y = int(cy - sub_h / 2)
-            box_br_x = int(cx + sub_w / 2)
-            box_br_y = int(cy + sub_h / 2)
-
-            # 绘制采样框（蓝色）
-            cv2.rectangle(image, (box_tl_x, box_tl_y),
-                          (box_br_x, box_br_y), (0, 0, 255), 2)
+            box_width = int(cx + sub_w / 2) - box_tl_x
+            box_height = int(cy + sub_h / 2) - box_tl_y
+            overlay.text(text_lines, (box_tl_x, box_tl_y, box_width, box_height),
+                         max_width=box_width * 0.8, color=(0, 0, 255), thickness=2)
 
-            # 在原始图像上绘制文本
-            box_width = box_br_x - box_tl_x
-            box_height = box_br_y - box_tl_y
-            self._draw_text_on_image(image, text_lines, 
-                                   (box_tl_x, box_tl_y, box_width, box_height),
-                                   max_width=box_width * 0.8, color=(0, 0, 255), thickness=2)
+        return overlay, stitched_img
 
+    def count(self, main_window=None):
+        """
+        分析当前图像：界面模式下在后台线程中分析，完成后显示结果和预览窗口
+        """
+        # 初始化参数
+        if main_window is not None:
+            self.update_params()
+            image = self.main_window.origin_img
+            if image is None:
+                print("错误：未加载图像")
+                return
+            self.analyze_in_background(image, preview=True)
+            return
 
-            # ========== 结果保存和显示 ==========
-            timestamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
-            output_dir = os.path.join('outputs', timestamp)
-            
-            # 弹窗询问是否保存结果
-            try:
-                from PySide6.QtWidgets import QMessageBox, QLabel, QVBoxLayout, QWidget, QPushButton, QHBoxLayout
-                from PySide6.QtGui import QPixmap, QImage
-                from PySide6.QtCore import Qt
-                
-                # 创建预览窗口
-                preview_window = QWidget()
-                preview_window.setWindowTitle('结果预览')
-                preview_window.resize(800, 650)
-                
-                # 创建布局
-                layout = QVBoxLayout()
-                
-                # 创建标签用于显示图片
-                label = QLabel()
-                label.setAlignment(Qt.AlignCenter)
-                
-                # 转换拼接图像以进行预览
-                if stitched_img is not None:
-                    # 转换颜色格式 (OpenCV是BGR,需要转换为RGB)
-                    img_rgb = cv2.cvtColor(stitched_img, cv2.COLOR_BGR2RGB)
-                    
-                    # 转换为QImage
-                    h, w, ch = img_rgb.shape
-                    bytes_per_line = ch * w
-                    q_img = QImage(img_rgb.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                    
-                    # 转换为QPixmap并适应窗口大小
-                    pixmap = QPixmap.fromImage(q_img)
-                    label.setPixmap(pixmap.scaled(780, 500, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-                
-                layout.addWidget(label)
-                
-                # 添加提示信息
-                info_label = QLabel("是否要保存结果？")
-                info_label.setAlignment(Qt.AlignCenter)
-                info_label.setWordWrap(True)
-                layout.addWidget(info_label)
-
-                # 添加按钮布局
-                button_layout = QHBoxLayout()
-                
-                # 确认保存按钮
-                save_button = QPushButton("保存")
-                save_button.clicked.connect(lambda: 
-                                            [self.save_detection_data(output_dir, self.image_path),
-                                             self.save_results(output_dir, stitched_img, sub_image_info)])
-                
-                # 取消按钮
-                cancel_button = QPushButton("取消")
-                cancel_button.clicked.connect(preview_window.close)
+        if self.image_path is None:
+            print("错误：未提供图像路径")
+            return
+        image = cv2.imread(self.image_path)
+        if image is None:
+            print(f"错误：无法读取图像 {self.image_path}")
+            return
 
-                
-                button_layout.addWidget(save_button)
-                button_layout.addWidget(cancel_button)
-                
-                layout.addLayout(button_layout)
-                preview_window.setLayout(layout)
-                preview_window.show()
-                
-                # 保存窗口引用以防止被垃圾回收
-                self.preview_window = preview_window
-                
-            except Exception as e:
-                print(f"预览窗口创建失败: {e}")
+        result = self.process(image)
+        if result is None:
+            return
+        overlay, stitched_img, sub_image_info = result
+        self.data = []
 
         # 结果显示
-        if self.image_path:
-            cv2.imshow('Analysis Result', image)
-            cv2.waitKey(0)
-            cv2.destroyAllWindows()
-        else:
-            self.main_window.result_img = image
-            self.main_window.basic.display_image(image)
+        cv2.imshow('Analysis Result', overlay.rasterize(image))
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
+
+    def refresh(self):
+        """
+        参数变化后重新分析当前图像并更新显示，不弹出预览窗口
+        """
+        image = self.main_window.origin_img
+        if image is None:
+            return
+        self.update_params()
+        self.analyze_in_background(image, preview=False)
+
+    def analyze_in_background(self, image, preview=True):
+        """
+        在后台线程中分析图像，尚未完成的上一次分析会被取消
+        :param preview: 完成后是否显示拼接结果预览窗口
+        """
+        params = self.snapshot(image)
+        params['stats'] = preview  # 只有弹出预览窗口的结果可以保存，才需要稳健统计量
+        jobs = self.main_window.analysis_jobs
+        jobs.cancel_all()
+        jobs.submit(
+            self.process, image, params,
+            name="分析",
+            on_done=lambda result: self.show_analysis(image, params, result, preview),
+            on_error=lambda error: self.main_window.statusBar().showMessage(f"分析失败: {error}"),
+            on_progress=self.main_window.show_progress)
+
+    def show_analysis(self, image, params, result, preview):
+        """
+        在界面线程中显示后台分析的结果
+        """
+        if result is None:
+            return
+        # 分析期间已加载了其他图像，结果作废
+        if self.main_window.origin_img is not image:
+            return
+
+        overlay, stitched_img, sub_image_info = result
+        self.data = []
+
+        if preview:
+            # ========== 结果预览（每次分析只创建一次） ==========
+            self.show_preview(stitched_img, sub_image_info, params)
+        elif getattr(self, 'preview_window', None) is not None:
+            # 已打开的预览窗口对应旧参数，关闭以免保存过期结果
+            self.preview_window.close()
+
+        self.main_window.basic.show_result(image, overlay)
 
 
 if __name__ == '__main__':
-    analyzer = Algorithm()
-    analyzer.image_path = r'samples\tests\plate_4x6.png'
-    analyzer.count()
\ No newline at end of file
+    # 无界面分析示例，批量处理请使用 batch.py
+    image_path = os.path.join('samples', 'tests', 'plate_4x6.png')
+    image = read_image(image_path)
+    for info in analyze_plate(image, rows=4, cols=6, r=0.2, precision=4):
+        print(f"({info['i'] + 1}, {info['j'] + 1})  Avg: {info['avg_gray']}  Diff: {info['gray_diff']:.4g}")
@@ -0,0 +1,310 @@
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from modules.sampler import WellGrid, gray_means, gray_stats
+
+
+def read_image(image_path):
+    """
+    读取图像（支持中文路径），读取失败时返回 None
+    """
+    try:
+        img_array = np.fromfile(image_path, dtype=np.uint8)
+    except OSError:
+        return None
+    return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+
+
+def guess_grid(image_path):
+    """
+    从文件名中猜测孔板的行列数，例如 plate_4x6.png -> (4, 6)
+    :return: (rows, cols)，无法识别时返回 (None, None)
+    """
+    # 去掉路径和文件扩展名
+    name_without_ext = os.path.splitext(os.path.basename(image_path))[0]
+
+    # 查找 'x' 或 '*' 分隔符
+    if '*' in name_without_ext:
+        separator = '*'
+    elif 'x' in name_without_ext:
+        separator = 'x'
+    else:
+        return None, None
+
+    sep_index = name_without_ext.index(separator)
+
+    # 分隔符之前紧邻的数字为行数
+    rows_str = ''
+    for char in reversed(name_without_ext[:sep_index]):
+        if char.isdigit():
+            rows_str = char + rows_str
+        else:
+            break
+
+    # 分隔符之后紧邻的数字为列数
+    cols_str = ''
+    for char in name_without_ext[sep_index + 1:]:
+        if char.isdigit():
+            cols_str += char
+        else:
+            break
+
+    if not rows_str or not cols_str:
+        return None, None
+
+    return int(rows_str), int(cols_str)
+
+
+def format_density(density, precision):
+    """
+    将浓度转换为 a*10^b 形式的字符串
+    """
+    if density > 0:
+        exponent = math.floor(math.log10(density))
+        mantissa = density / (10 ** exponent)
+        if exponent == 0:
+            return f"{mantissa:.{precision-1}g}"
+        return f"{mantissa:.{precision-1}g}*10^{exponent}"
+    return "0"
+
+
+def calibrate(means, precision, coefficients=None):
+    """
+    按有效数字取整各孔平均灰度，并以最亮的孔为基准计算灰度变化量和预测浓度
+    :param means: (N,) 各孔平均灰度
+    :return: (avg_gray, gray_diff, density) 三个 (N,) 数组
+    """
+    avg_gray = np.array([float(f"{m:.{precision}g}") for m in means], dtype=np.float64)
+    if avg_gray.size == 0:
+        return avg_gray, avg_gray, avg_gray
+
+    gray_diff = np.nanmax(avg_gray) - avg_gray
+    density = np.zeros_like(gray_diff)
+    if coefficients is not None:
+        nonzero = gray_diff != 0
+        # 多项式按数组计算，指数逐个计算以与逐孔计算的结果完全一致
+        density[nonzero] = [10 ** v for v in np.polyval(coefficients, gray_diff[nonzero]).tolist()]
+    return avg_gray, gray_diff, density
+
+
+# 每个孔的标量结果，按行优先顺序存放在一个结构化数组中
+RESULT_DTYPE = np.dtype([
+    ('i', np.int32),
+    ('j', np.int32),
+    ('cx', np.int32),
+    ('cy', np.int32),
+    ('box', np.int32, (4,)),  # 原图采样框坐标 (start_row, end_row, start_col, end_col)
+    ('avg_gray', np.float64),
+    ('gray_diff', np.float64),
+    ('density', np.float64),
+    # 采样区域灰度的稳健统计量，用于排查气泡、边缘伪影和过曝
+    ('median', np.float64),
+    ('trimmed_mean', np.float64),
+    ('std', np.float64),
+    ('min', np.float64),
+    ('max', np.float64),
+    ('saturated', np.float64),  # 饱和像素比例
+])
+
+# 由采样统计量直接复制到结果表的字段
+STATS_FIELDS = ('median', 'trimmed_mean', 'std', 'min', 'max', 'saturated')
+
+
+class WellRecord:
+    """
+    单个孔的结果视图，按 info['键'] 读取，不复制数据
+    除 RESULT_DTYPE 中的字段外，还支持 density_str（按精度格式化的浓度）和 sub_image（拼接图中的子图视图）
+    """
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        table = self.table
+        if key == 'sub_image':
+            return table.sub_image(self.index)
+        if key == 'density_str':
+            return format_density(float(table.data['density'][self.index]), table.precision)
+        if key == 'box':
+            return tuple(int(v) for v in table.data['box'][self.index])
+        if key not in RESULT_DTYPE.names:
+            raise KeyError(key)
+        return table.data[key][self.index].item()
+
+    def get(self, key, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def keys(self):
+        return list(RESULT_DTYPE.names) + ['density_str', 'sub_image']
+
+
+class WellTable:
+    """
+    整块孔板的结果表：标量字段保存在结构化数组中，子图是拼接图缓冲区中的视图
+    按序号或迭代得到 WellRecord，用法与字典列表一致
+    """
+    __slots__ = ('data', 'precision', 'mosaic', 'sub_h', 'sub_w')
+
+    def __init__(self, data, precision, mosaic=None, sub_h=0, sub_w=0):
+        self.data = data
+        self.precision = precision
+        self.mosaic = mosaic
+        self.sub_h = sub_h
+        self.sub_w = sub_w
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.data)
+        if not 0 <= index < len(self.data):
+            raise IndexError(index)
+        return WellRecord(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.data)):
+            yield WellRecord(self, index)
+
+    def sub_image(self, index):
+        """
+        第 index 个孔在拼接图中的子图视图，未关联拼接图时返回 None
+        """
+        if self.mosaic is None:
+            return None
+        i, j = int(self.data['i'][index]), int(self.data['j'][index])
+        return self.mosaic[i * self.sub_h:(i + 1) * self.sub_h, j * self.sub_w:(j + 1) * self.sub_w]
+
+    def with_mosaic(self, mosaic, sub_h, sub_w):
+        """
+        返回关联了拼接图的结果表（共享标量数据）
+        """
+        return WellTable(self.data, self.precision, mosaic, sub_h, sub_w)
+
+
+def build_table(grid, avg_gray, gray_diff, density, precision, stats=None):
+    """
+    组装每个孔的结果表（按行优先顺序）
+    :param stats: gray_stats 得到的统计量，为 None 时各统计字段为 nan
+    :return: WellTable
+    """
+    data = np.zeros(len(grid), dtype=RESULT_DTYPE)
+    data['i'] = grid.i
+    data['j'] = grid.j
+    data['cx'] = grid.cx
+    data['cy'] = grid.cy
+    data['box'] = grid.boxes
+    data['avg_gray'] = avg_gray
+    data['gray_diff'] = gray_diff
+    data['density'] = density
+    for name in STATS_FIELDS:
+        data[name] = np.nan if stats is None else stats[name]
+    return WellTable(data, precision)
+
+
+def analyze_wells(image, grid, precision, coefficients=None, mask='square', stats=True):
+    """
+    按给定网格分析孔板图像，返回每个孔的结果表（按行优先顺序）
+    :param image: BGR图像
+    :param grid: WellGrid 实例
+    :param precision: 有效数字位数
+    :param coefficients: 标准曲线多项式系数（从高次到低次），为 None 时浓度记为0
+    :param mask: 采样形状 square / circle / annulus
+    :param stats: 是否计算稳健统计量，为 False 时各统计字段为 nan
+    :return: WellTable，每项可按 i, j, cx, cy, box, avg_gray, gray_diff, density, density_str
+             以及 median, trimmed_mean, std, min, max, saturated 读取
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    means = gray_means(gray, grid, mask)
+    values = gray_stats(gray, grid, mask) if stats else None
+    return build_table(grid, *calibrate(means, precision, coefficients), precision, values)
+
+
+class AnalysisPipeline:
+    """
+    分阶段缓存的孔板分析流程：网格几何 → 孔采样（平均灰度，可选稳健统计量） → 标定 → 结果表
+    每个阶段按其全部输入缓存，参数变化时只重新计算受影响的下游阶段，
+    例如切换RNA类型或精度时无需重新采样
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cache = {}  # 阶段名 -> (键, 结果)
+        self._image = None
+        self._token = 0
+
+    def stage(self, name, key, compute):
+        """
+        返回阶段结果，键与上次相同时直接复用
+        """
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            value = compute()
+            self._cache[name] = (key, value)
+            return value
+
+    def image_key(self, image):
+        """
+        只读图像内容不会变化，按对象缓存；可写图像可能被原地修改，每次都视为新图像
+        """
+        with self._lock:
+            if image is not self._image or image.flags.writeable:
+                self._image = image
+                self._token += 1
+            return self._token
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._image = None
+
+    def run(self, image, rows, cols, r, precision, coefficients=None, mask='square', stats=True):
+        """
+        :param mask: 采样形状，只影响采样及其下游阶段
+        :param stats: 是否计算稳健统计量（需要取出孔内全部像素，实时预览等场合可关闭）
+        :return: (网格, 结果表, 键)，键的第一项为 (图像, 网格) 部分，
+                 可供调用方缓存只取决于图像和网格或取决于全部参数的后续阶段
+        """
+        height, width = image.shape[:2]
+        geometry = (height, width, rows, cols, r)
+        grid = self.stage('grid', geometry, lambda: WellGrid(*geometry))
+
+        source = (self.image_key(image), geometry)
+        gray = self.stage('gray', source, lambda: cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        means = self.stage('means', (source, mask), lambda: gray_means(gray, grid, mask))
+        extra = self.stage('stats', (source, mask), lambda: gray_stats(gray, grid, mask)) if stats else None
+
+        curve = None if coefficients is None else tuple(np.asarray(coefficients, dtype=float).tolist())
+        key = (source, mask, precision, curve)
+        values = self.stage('calibrate', key, lambda: calibrate(means, precision, coefficients))
+        table = self.stage('table', (key, stats), lambda: build_table(grid, *values, precision, extra))
+        return grid, table, key
+
+
+def analyze_plate(image, rows, cols, r, precision, coefficients=None, mask='square', stats=True):
+    """
+    无界面依赖的孔板分析接口
+    :param image: BGR图像
+    :param rows: 行数
+    :param cols: 列数
+    :param r: 采样半径比例
+    :param precision: 有效数字位数
+    :param coefficients: 标准曲线多项式系数，可选
+    :param mask: 采样形状 square / circle / annulus，默认方形采样框
+    :param stats: 是否计算稳健统计量
+    :return: 每个孔的结果表，详见 analyze_wells
+    """
+    height, width = image.shape[:2]
+    grid = WellGrid(height, width, rows, cols, r)
+    return analyze_wells(image, grid, precision, coefficients, mask, stats)
@@ -1,93 +1,49 @@
 from pathlib import Path
 
 import cv2 as cv
-import os
 
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
 
 from PySide6.QtWidgets import QFileDialog
-from PySide6.QtGui import QPixmap, QImage
+from PySide6.QtGui import QPainter, QPixmap, QImage
 from PySide6.QtWidgets import QSizePolicy
 from PySide6.QtCore import Qt
 
+from modules.analysis import guess_grid, read_image
+from modules.textcache import render_text
+
 class Basic:
 
     def __init__(self, main_window):
         self.main_window = main_window
 
-    def guess_args(self, image_path):
+        # 显示缓存
+        self._rgb_buffer = None
+        self._display_source = None
+        self._display_key = None
+        self._display_pixmap = None
+        self._display_scale = 1.0
 
-        # 获取文件名部分
-        filename = os.path.basename(image_path)
-        
-        # 去掉文件扩展名
-        name_without_ext = os.path.splitext(filename)[0]
-        
-        # 查找 'x' 或 '*' 分隔符
-        if '*' in name_without_ext:
-            separator = '*'
-        elif 'x' in name_without_ext:
-            separator = 'x'
-        else:
-            # raise ValueError("文件名中未找到有效的行列分隔符 'x' 或 '*'")
-            return None, None
-        
-        # 找到分隔符的位置
-        sep_index = name_without_ext.index(separator)
-        
-        # 从前向后查找数字字符，直到遇到非数字字符
-        rows_str = ''
-        for char in reversed(name_without_ext[:sep_index]):
-            if char.isdigit():
-                rows_str = char + rows_str
-            else:
-                break
-        
-        # 从后向前查找数字字符，直到遇到非数字字符
-        cols_str = ''
-        for char in name_without_ext[sep_index + 1:]:
-            if char.isdigit():
-                cols_str += char
-            else:
-                break
-        
-        # 检查提取的行列字符串是否为空
-        if not rows_str or not cols_str:
-            # raise ValueError(f"文件名格式不正确，应包含行列信息，当前分割结果为: {rows_str} 和 {cols_str}")
-            return None, None
-        
-        try:
-            rows = int(rows_str)
-            cols = int(cols_str)
-        except ValueError:
-            # raise ValueError(f"行列信息应为整数，当前分割结果为: {rows_str} 和 {cols_str}")
-            return None, None
+        self.show_labels = True  # 是否显示各孔的文本标注
+        self.viewer = None  # 大图查看窗口
 
-        return rows, cols
+    def guess_args(self, image_path):
+        """
+        根据文件名猜测行列数，详见 modules.analysis.guess_grid
+        """
+        return guess_grid(image_path)
     
     def put_chinese_text(self, img, text, font_path, font_size, color):
-        img_pil = Image.fromarray(cv.cvtColor(img, cv.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(img_pil)
-        font = ImageFont.truetype(font_path, font_size, encoding="utf-8")
-        
-        # 获取文本边界框
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # 计算文本居中位置
-        img_width, img_height = img_pil.size
-        x = (img_width - text_width) // 2
-        y = (img_height - text_height) // 2
-        
-        # 手动绘制粗体效果
-        for dx in range(-1, 1):
-            for dy in range(-1, 1):
-                draw.text((x + dx, y + dy), text, font=font, fill=color)
-        
-        img = cv.cvtColor(np.array(img_pil), cv.COLOR_RGB2BGR)
-        return img
+        """
+        在图像中央绘制中文文本，渲染结果缓存在磁盘中
+        :param img: BGR图像或背景图像路径
+        """
+        try:
+            return render_text(img, text, font_path, font_size, color)
+        except OSError as e:
+            # 字体或背景缺失时退回显示原背景
+            print(f"中文文本绘制失败: {e}")
+            return read_image(img) if isinstance(img, str) else img
     
     def load_image(self):
         """
@@ -98,6 +54,9 @@ class Basic:
         except Exception as e:
             pass  # 忽略摄像头模块未启用的异常
 
+        # 新图像需重新计数后才开启实时预览
+        self.main_window.preview.stop()
+
         # 文件选择对话框
         selected_file, _ = QFileDialog.getOpenFileName(
             parent=self.main_window,
@@ -132,7 +91,8 @@ class Basic:
                 # 存储图像属性
                 h, w, c = self.main_window.origin_img.shape
                 self.main_window.height, self.main_window.width, self.main_window.channels = h, w, c
-                self.main_window.result_img = self.main_window.origin_img.copy()
+                self.main_window.result_img = self.main_window.origin_img  # 图像只读，无需复制
+                self.main_window.overlay = None
                 
                 # 显示图像
                 self.display_image(self.main_window.result_img)
@@ -158,11 +118,15 @@ class Basic:
             print("No image to save.")
             return
 
+        # 标注图层在保存时才光栅化到图像上
+        if self.main_window.overlay is not None:
+            img = self.main_window.overlay.rasterize(img, text=self.show_labels)
+
         # 将图像从 BGR 转换为 RGB 格式以适应 Qt
         img_rgb = cv.cvtColor(img, cv.COLOR_BGR2RGB)
 
         # 创建 QImage 并使用图像数据初始化
-        qimg = QImage(img_rgb.data, img_rgb.shape[1], img_rgb.shape[0], QImage.Format_RGB888)
+        qimg = QImage(img_rgb.data, img_rgb.shape[1], img_rgb.shape[0], 3 * img_rgb.shape[1], QImage.Format_RGB888)
         
         # 从 QImage 创建原始 QPixmap
         pixmap = QPixmap.fromImage(qimg)
@@ -192,32 +156,101 @@ class Basic:
             # print(f"Error: {e}")
             pass
 
+        self.main_window.preview.stop()
+
+        # 图像在存储中只读，结果图像直接共享原始图像
         self.main_window.result_img = self.main_window.origin_img
+        self.main_window.overlay = None
         self.display_image(self.main_window.result_img)
 
-    def display_image(self, img):
-        # 将opencv图像转换为QImage格式
-        height, width, channel = img.shape
-        bytesPerLine = 3 * width
-        qImg = QImage(img.data, width, height, bytesPerLine, QImage.Format.Format_RGB888).rgbSwapped()
+    def show_result(self, image, overlay):
+        """
+        将分析结果设为当前结果并显示：图像保持原样，标注图层叠加显示
+        """
+        self.main_window.result_img = image
+        self.main_window.overlay = overlay
+        self.display_image(image, overlay)
+
+    def toggle_labels(self):
+        """
+        切换各孔文本标注的显示，只重绘标注图层
+        """
+        self.show_labels = not self.show_labels
+        if self.main_window.result_img is not None:
+            self.display_image(self.main_window.result_img, self.main_window.overlay)
+
+    def display_image(self, img, overlay=None):
+        """
+        显示图像：先按控件尺寸缩小，再转换为RGB写入复用的缓冲区并零拷贝构造QImage，
+        同一幅只读图像在控件尺寸不变时直接复用上次生成的QPixmap；
+        标注图层按显示分辨率绘制在QPixmap副本上，不修改图像像素
+        """
+        label = self.main_window.ui.result_img
 
         # 获取显示控件的尺寸
-        label_width = self.main_window.ui.result_img.width()
-        label_height = self.main_window.ui.result_img.height()
+        label_width = label.width()
+        label_height = label.height()
+
+        # 只读图像内容不会变化，可按对象缓存
+        key = (label_width, label_height)
+        if not (img is self._display_source and key == self._display_key and not img.flags.writeable):
+            self._render_base(img, label_width, label_height)
+            self._display_source = img
+            self._display_key = key
+
+        pixmap = self._display_pixmap
+        if overlay is not None:
+            pixmap = pixmap.copy()
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            overlay.paint(painter, self._display_scale, text=self.show_labels)
+            painter.end()
 
+        # 显示放缩后的图像
+        label.setPixmap(pixmap)
+        label.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+    def _render_base(self, img, label_width, label_height):
+        """
+        生成适应控件尺寸的图像QPixmap
+        """
         # 计算放缩比例
-        scale_width = label_width / width
-        scale_height = label_height / height
-        scale = min(scale_width, scale_height)
+        height, width = img.shape[:2]
+        scale = min(label_width / width, label_height / height)
 
         # 计算放缩后的图像尺寸
-        new_width = int(width * scale)
-        new_height = int(height * scale)
+        new_width = max(1, int(width * scale))
+        new_height = max(1, int(height * scale))
 
-        # 将QImage转换为QPixmap并放缩
-        pixmap = QPixmap.fromImage(qImg).scaled(new_width, new_height, Qt.AspectRatioMode.KeepAspectRatio)
+        # 先在OpenCV中放缩，缩小时使用区域插值
+        interpolation = cv.INTER_AREA if scale < 1 else cv.INTER_LINEAR
+        small = cv.resize(img, (new_width, new_height), interpolation=interpolation)
 
-        # 显示放缩后的图像
-        self.main_window.ui.result_img.setPixmap(pixmap)
-        self.main_window.ui.result_img.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Fixed)
-        self.main_window.ui.result_img.setAlignment(Qt.AlignmentFlag.AlignCenter)
\ No newline at end of file
+        # BGR -> RGB 写入复用的缓冲区
+        if self._rgb_buffer is None or self._rgb_buffer.shape != small.shape:
+            self._rgb_buffer = np.empty_like(small)
+        cv.cvtColor(small, cv.COLOR_BGR2RGB, dst=self._rgb_buffer)
+
+        # QImage直接引用缓冲区内存，不做复制
+        qImg = QImage(self._rgb_buffer.data, new_width, new_height, 3 * new_width, QImage.Format.Format_RGB888)
+        self._display_pixmap = QPixmap.fromImage(qImg)
+        self._display_scale = new_width / width
+
+    def open_viewer(self):
+        """
+        在独立窗口中打开当前结果图像，支持按原始分辨率缩放和平移
+        """
+        img = self.main_window.result_img
+        if img is None:
+            return
+
+        from modules.viewer import TiledImageView
+
+        if self.viewer is None:
+            self.viewer = TiledImageView()
+            self.viewer.setWindowTitle("图像查看")
+            self.viewer.resize(self.main_window.size())
+        self.viewer.set_image(img, self.main_window.overlay, self.show_labels)
+        self.viewer.show()
+        self.viewer.raise_()
@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+
+
+DEFAULT_CURVE_PATH = os.path.join('arguments', 'curve.xlsx')
+
+
+class CalibrationStore:
+    """
+    标准曲线缓存：一次性读取curve.xlsx中的所有表并拟合多项式
+    拟合结果按表名缓存在内存中，并以文件修改时间为校验写入同名 .npz 旁路文件，
+    下次启动时若Excel未修改则直接读取 .npz，无需再打开Excel
+    """
+    def __init__(self, excel_path=DEFAULT_CURVE_PATH, degree=5):
+        self.excel_path = excel_path
+        self.cache_path = os.path.splitext(excel_path)[0] + '.npz'
+        self.degree = degree
+
+        self._mtime = None
+        self._curves = {}  # 表名 -> (x, y, coefficients)
+
+    def _current_mtime(self):
+        if not os.path.exists(self.excel_path):
+            raise FileNotFoundError(f"找不到Excel文件: {self.excel_path}")
+        return os.stat(self.excel_path).st_mtime_ns
+
+    def _load_sidecar(self, mtime):
+        """
+        读取 .npz 旁路文件，文件不存在或已过期时返回 None
+        """
+        if not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path) as data:
+                if int(data['mtime']) != mtime or int(data['degree']) != self.degree:
+                    return None
+                return {
+                    str(name): (data[f'x_{k}'], data[f'y_{k}'], data[f'coef_{k}'])
+                    for k, name in enumerate(data['sheets'])
+                }
+        except Exception as e:
+            print(f"标准曲线缓存读取失败，将重新解析Excel: {e}")
+            return None
+
+    def _save_sidecar(self, mtime, curves):
+        arrays = {
+            'mtime': np.int64(mtime),
+            'degree': np.int64(self.degree),
+            'sheets': np.array(list(curves), dtype=str),
+        }
+        for k, (x, y, coefficients) in enumerate(curves.values()):
+            arrays[f'x_{k}'] = x
+            arrays[f'y_{k}'] = y
+            arrays[f'coef_{k}'] = coefficients
+        try:
+            np.savez(self.cache_path, **arrays)
+        except OSError as e:
+            print(f"标准曲线缓存写入失败: {e}")
+
+    def _parse_workbook(self):
+        """
+        打开一次Excel读取所有表，并为每个表拟合多项式
+        """
+        import pandas as pd
+
+        curves = {}
+        for name, df in pd.read_excel(self.excel_path, sheet_name=None).items():
+            x = df['相对灰度'].to_numpy(dtype=np.float64)
+            y = df['lg(浓度)'].to_numpy(dtype=np.float64)
+            curves[name] = (x, y, np.polyfit(x, y, self.degree))
+        return curves
+
+    def load(self):
+        """
+        确保缓存与Excel文件同步，Excel未修改时不做任何读取
+        """
+        mtime = self._current_mtime()
+        if mtime == self._mtime:
+            return
+
+        curves = self._load_sidecar(mtime)
+        if curves is None:
+            curves = self._parse_workbook()
+            self._save_sidecar(mtime, curves)
+
+        self._curves = curves
+        self._mtime = mtime
+
+    def sheet_names(self):
+        """
+        返回所有RNA类型（Excel表名）
+        """
+        self.load()
+        return list(self._curves)
+
+    def curve(self, sheet_name):
+        """
+        返回指定表的拟合数据 (x, y, coefficients)
+        """
+        self.load()
+        if sheet_name not in self._curves:
+            raise KeyError(f"curve.xlsx中不存在表: {sheet_name}")
+        return self._curves[sheet_name]
+
+    def coefficients(self, sheet_name):
+        """
+        返回指定表的多项式系数（从高次到低次）
+        """
+        return self.curve(sheet_name)[2]
+
+
+_stores = {}
+
+
+def get_store(excel_path=DEFAULT_CURVE_PATH):
+    """
+    返回共享的标准曲线缓存实例，同一文件只解析一次
+    """
+    key = os.path.abspath(excel_path)
+    if key not in _stores:
+        _stores[key] = CalibrationStore(excel_path)
+    return _stores[key]
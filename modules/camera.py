@@ -1,28 +1,105 @@
+import collections
+import threading
 
+from PySide6.QtCore import QObject, Signal
 
-import cv2 as cv
-import threading
+from modules.gate import ChangeGate
+from modules.source import CameraSource, open_source
+
+
+class FrameRing:
+    """
+    有界帧环形缓冲区
+    采集线程不断写入，分析线程每次只取最新一帧，未被取走的旧帧直接丢弃
+    """
+    def __init__(self, size=3):
+        self._frames = collections.deque(maxlen=size)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self.closed = False
+        self.dropped = 0  # 被跳过的帧数
+
+    def put(self, frame):
+        """
+        写入一帧，缓冲区满时最旧的帧被覆盖
+        """
+        with self._cond:
+            self._seq += 1
+            self._frames.append((self._seq, frame))
+            self._cond.notify_all()
+
+    def latest(self, after=0, timeout=None):
+        """
+        等待并取出序号大于 after 的最新一帧，同时清空缓冲区
+        :return: (序号, 帧)，超时或缓冲区已关闭时帧为 None
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self.closed or (self._frames and self._frames[-1][0] > after), timeout)
+            if not ready or not self._frames or self._frames[-1][0] <= after:
+                return after, None
 
-class Camera:
+            seq, frame = self._frames[-1]
+            self.dropped += seq - after - 1
+            self._frames.clear()
+            return seq, frame
 
-    def __init__(self, main_window):
+    def close(self):
+        """
+        关闭缓冲区，唤醒所有等待的线程
+        """
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class Camera(QObject):
+    """
+    实时采集：采集线程写入帧缓冲区，分析线程总是处理最新一帧，
+    分析结果通过Qt信号交给界面线程显示
+    """
+    # 原始帧, 标注图层, 拼接图像, 子图信息
+    result_ready = Signal(object, object, object, object)
+
+    def __init__(self, main_window, source=None, buffer_size=3):
+        """
+        :param source: 帧来源（相机编号、视频文件、图像目录或多页TIFF），
+                       默认依次尝试内置和外接摄像头，详见 modules.source.open_source
+        """
+        super().__init__()
 
         self.main_window = main_window
 
         self.thread_running = False  # 控制线程是否运行的标志
-        self.worker_thread = None  # 存储线程实例
+        self.worker_thread = None  # 采集线程实例
+        self.analysis_thread = None  # 分析线程实例
+
+        self.buffer_size = buffer_size
+        self.ring = FrameRing(buffer_size)
+        self.gate = ChangeGate()  # 孔板静止时跳过重复分析
+
+        # 跨线程信号自动以队列方式在界面线程中执行
+        self.result_ready.connect(self.show_result)
+
+        if source is not None:
+            self.cap = open_source(source)
+            if not self.cap.isOpened():
+                print(f"无法打开帧来源: {source}")
+            else:
+                print(f"成功打开帧来源: {source}")
+            return
 
         # 首先尝试使用内置摄像头
-        self.cap = cv.VideoCapture(0)
+        self.cap = CameraSource(0)
 
         # 检查内置摄像头是否成功打开
         if not self.cap.isOpened():
             # 如果内置摄像头失败，则尝试外接摄像头
-            self.cap = cv.VideoCapture(1)
+            self.cap = CameraSource(1)
             if not self.cap.isOpened():
                 print("未检测到任何摄像头!")
                 return
-            else:   
+            else:
                 print("成功读取外接摄像头...")
         else :
             print("成功读取内置摄像头...")
@@ -32,31 +109,78 @@ class Camera:
             self.start_thread()
         else:
             self.stop_thread()
-    
+
     def start_thread(self):
         self.thread_running = True
         self.main_window.ui.capture_button.setText("停止捕获")
+        self.ring = FrameRing(self.buffer_size)
+        self.gate.reset()
+        self.cap.start()  # 恢复暂停的帧来源
         self.worker_thread = threading.Thread(target=self.thread_worker, daemon=True)
+        self.analysis_thread = threading.Thread(target=self.analysis_worker, daemon=True)
         self.worker_thread.start()
+        self.analysis_thread.start()
 
     def stop_thread(self):
         self.thread_running = False
+        self.ring.close()
         self.main_window.ui.capture_button.setText("相机捕获")
-        if self.worker_thread is not None:
-            self.worker_thread.join()
+        for thread in (self.worker_thread, self.analysis_thread):
+            if thread is not None:
+                thread.join()
         self.worker_thread = None
+        self.analysis_thread = None
+        self.cap.pause()  # 停止后台读取，相机同时关闭设备
 
     def thread_worker(self):
-
+        """
+        采集线程：只负责读取帧并写入缓冲区，不等待分析
+        """
         while self.thread_running:
-            
+
             # 采集一帧图像
-            ret, self.main_window.origin_img = self.cap.read()
+            ret, frame = self.cap.read()
 
             if not ret:
-                print("无法获取帧，请检查摄像头是否正常工作。")
+                print("帧来源已结束或无法获取帧，请检查摄像头是否正常工作。")
+                self.ring.close()
                 break
             else:
-                # 调用算法进行处理
-                self.main_window.algorithm.count()
+                self.ring.put(frame)
 
+    def analysis_worker(self):
+        """
+        分析线程：总是取最新一帧进行分析，分析期间到达的旧帧被丢弃，
+        图像未变化的帧由变化检测门限跳过
+        """
+        seq = 0
+        while self.thread_running:
+            seq, frame = self.ring.latest(seq, timeout=0.5)
+            if frame is None:
+                if self.ring.closed:
+                    break
+                continue
+
+            algorithm = self.main_window.algorithm
+            algorithm.update_params()
+
+            # 各孔亮度没有明显变化时沿用上一次的分析结果
+            params = (algorithm.r, algorithm.precision, algorithm.mask, algorithm.RNA_type)
+            if not self.gate.should_analyze(frame, algorithm.rows, algorithm.cols, params):
+                continue
+
+            # 实时画面只用于显示，不计算稳健统计量
+            snapshot = algorithm.snapshot()
+            snapshot['stats'] = False
+            result = algorithm.process(frame, snapshot)
+            if result is not None:
+                self.result_ready.emit(frame, *result)
+
+    def show_result(self, frame, overlay, stitched_img, sub_image_info):
+        """
+        在界面线程中更新显示
+        """
+        if not self.thread_running:
+            return
+        self.main_window.origin_img = frame
+        self.main_window.basic.show_result(frame, overlay)
@@ -0,0 +1,132 @@
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+# 子图嵌入模式
+IMAGES_FULL = 'full'            # 嵌入原尺寸子图
+IMAGES_THUMBNAIL = 'thumbnail'  # 嵌入缩略图（默认）
+IMAGES_NONE = 'none'            # 仅导出数据，不嵌入图片
+
+THUMBNAIL_SIZE = 80  # Excel中子图的显示尺寸（像素）
+
+
+def encode_thumbnail(sub_image, size=THUMBNAIL_SIZE):
+    """
+    将子图缩放到显示尺寸并编码为PNG字节
+    :param size: 缩略图边长，为 None 时保留原尺寸
+    """
+    if size is not None:
+        h, w = sub_image.shape[:2]
+        scale = size / max(h, w)
+        if scale < 1:
+            sub_image = cv2.resize(sub_image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                                   interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.png', sub_image)
+    return buffer.tobytes() if ok else None
+
+
+def encode_images(sub_images, size=THUMBNAIL_SIZE, workers=None):
+    """
+    使用线程池并行缩放并编码子图（OpenCV在缩放和编码时释放GIL）
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda img: None if img is None else encode_thumbnail(img, size), sub_images))
+
+
+def write_results_workbook(path, sub_image_info, coefficients=None, images=IMAGES_THUMBNAIL, workers=None):
+    """
+    以流式（write-only）模式写出检测结果Excel，所有单元格共用同一套命名样式
+    :param path: 输出路径
+    :param sub_image_info: 每个孔的结果表
+    :param coefficients: 标准曲线多项式系数，不为 None 时写入"标曲拟合系数"表
+    :param images: 子图嵌入模式，见 IMAGES_FULL / IMAGES_THUMBNAIL / IMAGES_NONE
+    :param workers: 图片编码线程数，默认由线程池决定
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.drawing.image import Image as XLImage
+    from openpyxl.styles import Alignment, Font, NamedStyle
+
+    wb = Workbook(write_only=True)
+
+    # 共享样式：居中 / 居中加粗
+    center_style = NamedStyle(name="居中", alignment=Alignment(horizontal="center", vertical="center"))
+    header_style = NamedStyle(name="表头", font=Font(bold=True),
+                              alignment=Alignment(horizontal="center", vertical="center"))
+    wb.add_named_style(center_style)
+    wb.add_named_style(header_style)
+
+    def styled_row(ws, values, style):
+        row = []
+        for value in values:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            row.append(cell)
+        return row
+
+    # 并行编码子图
+    embed = images != IMAGES_NONE
+    encoded = []
+    if embed:
+        size = None if images == IMAGES_FULL else THUMBNAIL_SIZE
+        encoded = encode_images([info.get('sub_image') for info in sub_image_info], size, workers)
+
+    # ========== 详细检测数据 ==========
+    ws1 = wb.create_sheet("详细检测数据")
+
+    # 列宽和行高需在写入数据之前设置
+    headers = ['行号', '列号', '原始灰度', '相对灰度', '预测浓度', 'lg(浓度)',
+               '中位灰度', '截尾均值', '灰度标准差', '最小灰度', '最大灰度', '饱和比例']
+    widths = [8, 8, 12, 12, 16, 16, 12, 12, 12, 12, 12, 12]
+    if embed:
+        headers.append('原始子图')
+        widths.append(12)
+    image_column = chr(ord('A') + len(headers) - 1)
+    for col, width in enumerate(widths):
+        ws1.column_dimensions[chr(ord('A') + col)].width = width
+
+    ws1.row_dimensions[1].height = 30  # 表头行高
+    if embed:
+        # 数据行统一使用默认行高，便于显示图像
+        ws1.sheet_format.defaultRowHeight = 60
+        ws1.sheet_format.customHeight = True
+
+    ws1.append(styled_row(ws1, headers, "表头"))
+
+    for idx, info in enumerate(sub_image_info):
+        density = info['density']
+        log_density = math.log10(density) if density > 0 else 0
+        ws1.append(styled_row(ws1, [
+            info['i'] + 1,          # 行号（从1开始）
+            info['j'] + 1,          # 列号（从1开始）
+            info['avg_gray'],       # 原始灰度值
+            info['gray_diff'],      # 相对灰度值
+            density,                # 预测浓度
+            log_density,            # log10(浓度)
+            # 稳健统计量
+            info.get('median'), info.get('trimmed_mean'), info.get('std'),
+            info.get('min'), info.get('max'), info.get('saturated'),
+        ], "居中"))
+
+        if embed and encoded[idx] is not None:
+            img = XLImage(io.BytesIO(encoded[idx]))
+            img.width = THUMBNAIL_SIZE
+            img.height = THUMBNAIL_SIZE
+            img.anchor = f'{image_column}{idx + 2}'  # 最后一列是原始子图列
+            ws1.add_image(img)
+
+    # ========== 标曲拟合系数 ==========
+    if coefficients is not None:
+        coeff_ws = wb.create_sheet("标曲拟合系数")
+        coeff_ws.column_dimensions['A'].width = 15
+        coeff_ws.column_dimensions['B'].width = 20
+
+        coeff_ws.append(styled_row(coeff_ws, ["系数项", "系数值"], "表头"))
+        coeff_names = ["x^5", "x^4", "x^3", "x^2", "x^1", "x^0"]
+        for name, coeff in zip(coeff_names, coefficients):
+            coeff_ws.append(styled_row(coeff_ws, [name, float(coeff)], "居中"))
+
+    wb.save(path)
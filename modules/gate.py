@@ -0,0 +1,69 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class ChangeGate:
+    """
+    实时模式的变化检测门限
+    在缩略图上比较各孔的平均亮度，只有孔板图像发生明显变化或超过最长间隔时才放行完整分析
+    """
+    def __init__(self, threshold=2.0, max_interval=5.0, cell_size=8):
+        """
+        :param threshold: 任一孔平均灰度变化超过该值时视为图像已变化
+        :param max_interval: 最长分析间隔（秒），超过后即使图像未变化也重新分析
+        :param cell_size: 缩略图中每个孔对应的像素边长
+        """
+        self.threshold = threshold
+        self.max_interval = max_interval
+        self.cell_size = cell_size
+
+        self.reference = None   # 上次分析时各孔的平均灰度
+        self.last_time = None   # 上次分析的时间
+        self.last_params = None  # 上次分析时的参数
+        self.skipped = 0        # 被跳过的帧数
+
+    def reset(self):
+        self.reference = None
+        self.last_time = None
+        self.last_params = None
+
+    def well_levels(self, frame, rows=1, cols=1):
+        """
+        将图像缩小到每孔 cell_size x cell_size 像素，返回 (rows, cols) 的各孔平均灰度
+        """
+        size = self.cell_size
+        height, width = frame.shape[:2]
+
+        # 先按步长抽取像素（保留约4倍目标分辨率），避免对整幅大图做区域插值
+        step = max(1, min(height // (rows * size), width // (cols * size)) // 4)
+        if step > 1:
+            frame = np.ascontiguousarray(frame[::step, ::step])
+        small = cv2.resize(frame, (cols * size, rows * size), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small.reshape(rows, size, cols, size).mean(axis=(1, 3), dtype=np.float32)
+
+    def should_analyze(self, frame, rows=1, cols=1, params=None, now=None):
+        """
+        判断当前帧是否需要完整分析，放行时以当前帧作为新的参考
+        :param params: 其他分析参数（如半径、精度、RNA类型），变化时同样放行
+        """
+        now = time.monotonic() if now is None else now
+        levels = self.well_levels(frame, rows, cols)
+
+        changed = (
+            self.reference is None
+            or params != self.last_params
+            or self.reference.shape != levels.shape
+            or float(np.abs(levels - self.reference).max()) > self.threshold
+            or now - self.last_time >= self.max_interval
+        )
+        if changed:
+            self.reference = levels
+            self.last_time = now
+            self.last_params = params
+        else:
+            self.skipped += 1
+        return changed
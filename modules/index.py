@@ -0,0 +1,265 @@
+"""
+outputs/ 检测结果索引（SQLite）
+
+保存结果时自动登记检测参数和每孔数据，历史结果可通过 rebuild 增量扫描补录：
+    python -m modules.index rebuild
+    python -m modules.index query --type miR-223 --from 2026-01-01 --to 2026-06-30
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import sqlite3
+
+
+DEFAULT_OUTPUTS_DIR = 'outputs'
+INDEX_NAME = 'index.sqlite'
+RUN_DIR_FORMAT = '%Y%m%d-%H%M%S'  # 结果目录名即检测时间
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_dir TEXT UNIQUE NOT NULL,
+    timestamp TEXT,
+    rna_type TEXT,
+    plate TEXT,
+    rows INTEGER,
+    cols INTEGER,
+    r REAL,
+    precision INTEGER,
+    source TEXT,
+    mask TEXT,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS wells (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    row INTEGER,
+    col INTEGER,
+    avg_gray REAL,
+    gray_diff REAL,
+    density REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs(timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_rna_type ON runs(rna_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_runs_plate ON runs(plate, timestamp);
+CREATE INDEX IF NOT EXISTS idx_wells_run ON wells(run_id);
+"""
+
+
+def parse_run_time(run_dir):
+    """
+    从结果目录名解析检测时间，无法解析时返回 None
+    """
+    try:
+        return datetime.datetime.strptime(os.path.basename(run_dir), RUN_DIR_FORMAT)
+    except ValueError:
+        return None
+
+
+class ResultIndex:
+    """
+    检测结果索引，按日期、RNA类型和孔板编号快速查询历史检测
+    """
+    def __init__(self, outputs_dir=DEFAULT_OUTPUTS_DIR):
+        self.outputs_dir = outputs_dir
+        self.db_path = os.path.join(outputs_dir, INDEX_NAME)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        os.makedirs(self.outputs_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate(conn):
+        """
+        为旧版本创建的索引补充新增列（旧记录均为方形采样）
+        """
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(runs)")}
+        if 'mask' not in columns:
+            with conn:
+                conn.execute("ALTER TABLE runs ADD COLUMN mask TEXT DEFAULT 'square'")
+
+    @staticmethod
+    def _insert(conn, run_dir, params, wells, mtime):
+        """
+        写入（或替换）一次检测记录
+        :param params: 包含 timestamp, rna_type, plate, rows, cols, r, precision, source, mask 的字典
+        :param wells: [(row, col, avg_gray, gray_diff, density), ...]
+        """
+        conn.execute("DELETE FROM runs WHERE run_dir = ?", (run_dir,))
+        timestamp = params.get('timestamp')
+        cursor = conn.execute(
+            "INSERT INTO runs (run_dir, timestamp, rna_type, plate, rows, cols, r, precision, source, mask, mtime) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_dir, timestamp.strftime('%Y-%m-%d %H:%M:%S') if timestamp else None,
+             params.get('rna_type'), params.get('plate'), params.get('rows'), params.get('cols'),
+             params.get('r'), params.get('precision'), params.get('source'), params.get('mask', 'square'),
+             mtime))
+        run_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO wells (run_id, row, col, avg_gray, gray_diff, density) VALUES (?, ?, ?, ?, ?, ?)",
+            ((run_id, *well) for well in wells))
+        return run_id
+
+    def record_run(self, output_dir, rows, cols, r, precision, rna_type, sub_image_info, source=None,
+                   mask='square'):
+        """
+        登记一次刚保存的检测结果
+        """
+        run_dir = os.path.basename(os.path.normpath(output_dir))
+        params = {
+            'timestamp': parse_run_time(run_dir) or datetime.datetime.now(),
+            'rna_type': rna_type,
+            'plate': os.path.splitext(os.path.basename(source))[0] if source else None,
+            'rows': rows, 'cols': cols, 'r': r, 'precision': precision,
+            'source': source, 'mask': mask,
+        }
+        wells = [(info['i'] + 1, info['j'] + 1, info['avg_gray'], info['gray_diff'], info['density'])
+                 for info in sub_image_info]
+        with self._connect() as conn:
+            return self._insert(conn, run_dir, params, wells, os.stat(output_dir).st_mtime)
+
+    @staticmethod
+    def _read_run_folder(run_path):
+        """
+        从结果目录中的 输入参数.xlsx 和 检测结果.xlsx 读取检测参数和每孔数据
+        """
+        from openpyxl import load_workbook
+
+        names = {'行数': 'rows', '列数': 'cols', '半径': 'r', '精度': 'precision',
+                 '类型': 'rna_type', '图像': 'source', '采样形状': 'mask'}
+        params = {'timestamp': parse_run_time(run_path)}
+
+        wb = load_workbook(os.path.join(run_path, '输入参数.xlsx'), read_only=True)
+        try:
+            for name, value in wb.active.iter_rows(min_row=2, max_col=2, values_only=True):
+                if name in names:
+                    params[names[name]] = value
+        finally:
+            wb.close()
+        if params.get('source'):
+            params['plate'] = os.path.splitext(os.path.basename(params['source']))[0]
+
+        wells = []
+        results_path = os.path.join(run_path, '检测结果.xlsx')
+        if os.path.exists(results_path):
+            wb = load_workbook(results_path, read_only=True)
+            try:
+                for values in wb['详细检测数据'].iter_rows(min_row=2, max_col=5, values_only=True):
+                    if values[0] is not None:
+                        wells.append(values)
+            finally:
+                wb.close()
+        return params, wells
+
+    def rebuild(self, full=False):
+        """
+        扫描 outputs/ 下的结果目录并补录索引
+        :param full: 为 True 时重建全部记录，否则只处理新增或修改过的目录
+        :return: (新增/更新数, 删除数)
+        """
+        with self._connect() as conn:
+            known = {row['run_dir']: row['mtime'] for row in conn.execute("SELECT run_dir, mtime FROM runs")}
+
+            updated = 0
+            present = set()
+            for entry in sorted(os.listdir(self.outputs_dir)):
+                run_path = os.path.join(self.outputs_dir, entry)
+                if not os.path.isfile(os.path.join(run_path, '输入参数.xlsx')):
+                    continue
+                present.add(entry)
+
+                mtime = os.stat(run_path).st_mtime
+                if not full and known.get(entry) == mtime:
+                    continue
+                try:
+                    params, wells = self._read_run_folder(run_path)
+                except Exception as e:
+                    print(f"跳过 {run_path}: {e}")
+                    continue
+                self._insert(conn, entry, params, wells, mtime)
+                updated += 1
+
+            # 清理已删除的结果目录
+            removed = [(run_dir,) for run_dir in known if run_dir not in present]
+            conn.executemany("DELETE FROM runs WHERE run_dir = ?", removed)
+
+        return updated, len(removed)
+
+    def query(self, start=None, end=None, rna_type=None, plate=None):
+        """
+        按条件查询检测记录
+        :param start: 起始时间（包含），datetime 或 'YYYY-MM-DD[ HH:MM:SS]' 字符串
+        :param end: 结束时间（包含），只给日期时包含当天全部记录
+        :return: sqlite3.Row 列表，按时间排序
+        """
+        conditions, args = [], []
+        if start:
+            conditions.append("timestamp >= ?")
+            args.append(str(start))
+        if end:
+            end = str(end)
+            conditions.append("timestamp <= ?")
+            args.append(end + ' 23:59:59' if len(end) == 10 else end)
+        if rna_type:
+            conditions.append("rna_type = ?")
+            args.append(rna_type)
+        if plate:
+            conditions.append("plate = ?")
+            args.append(plate)
+
+        sql = "SELECT * FROM runs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp"
+        with self._connect() as conn:
+            return conn.execute(sql, args).fetchall()
+
+    def wells(self, run_id):
+        """
+        返回指定检测的每孔数据
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT row, col, avg_gray, gray_diff, density FROM wells "
+                                "WHERE run_id = ? ORDER BY row, col", (run_id,)).fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检测结果索引")
+    parser.add_argument('--outputs', default=DEFAULT_OUTPUTS_DIR, help="结果目录 (默认: outputs)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rebuild_parser = sub.add_parser('rebuild', help="扫描结果目录并更新索引")
+    rebuild_parser.add_argument('--full', action='store_true', help="重建全部记录")
+
+    query_parser = sub.add_parser('query', help="查询检测记录")
+    query_parser.add_argument('--from', dest='start', help="起始日期 YYYY-MM-DD")
+    query_parser.add_argument('--to', dest='end', help="结束日期 YYYY-MM-DD")
+    query_parser.add_argument('--type', dest='rna_type', help="RNA类型")
+    query_parser.add_argument('--plate', help="孔板编号（原始图像文件名）")
+
+    args = parser.parse_args(argv)
+    index = ResultIndex(args.outputs)
+
+    if args.command == 'rebuild':
+        updated, removed = index.rebuild(args.full)
+        print(f"索引已更新: 新增/更新 {updated} 条，删除 {removed} 条")
+    else:
+        runs = index.query(args.start, args.end, args.rna_type, args.plate)
+        for run in runs:
+            print(f"{run['run_dir']}  {run['timestamp']}  {run['rna_type'] or '-'}  "
+                  f"{run['plate'] or '-'}  {run['rows']}x{run['cols']}")
+        print(f"共 {len(runs)} 条记录")
+
+
+if __name__ == '__main__':
+    main()
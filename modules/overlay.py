@@ -0,0 +1,256 @@
+import functools
+
+import cv2
+
+from modules.sampler import ANNULUS_INNER
+
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+LINE_TEMPLATE = "0"  # 缩放后估算字高变化时使用的代表文本
+
+
+@functools.lru_cache(maxsize=65536)
+def text_size(line, text_scale, thickness):
+    """
+    带缓存的 cv2.getTextSize
+    :return: ((宽, 高), 基线)
+    """
+    return cv2.getTextSize(line, FONT, text_scale, thickness)
+
+
+def initial_scale(width, height):
+    """
+    按区域大小确定的初始字体缩放比例
+    """
+    base_scale = 0.004
+    text_scale = min(width, height) * base_scale
+    return max(0.3, min(text_scale, 1.0))
+
+
+@functools.lru_cache(maxsize=4096)
+def block_layout(width, height, max_width, thickness, count, widest, tallest, descent):
+    """
+    计算一组文本的字体大小和行偏移，只取决于区域尺寸、行数和各行的尺寸等级，结果缓存
+    :param widest: 初始字体大小下最宽一行的像素宽度
+    :param tallest: 初始字体大小下最高一行的像素高度
+    :param descent: 初始字体大小下各行基线的最大值（下行字母的深度）
+    :return: (字体缩放比例, 行高, 首行基线相对区域顶部的偏移, 行距)
+    """
+    text_scale = initial_scale(width, height)
+    max_line_height, baseline = tallest, descent
+
+    # 自动调整大小以适应宽度
+    if max_width and widest > max_width:
+        base_height = text_size(LINE_TEMPLATE, text_scale, thickness)[0][1]
+        text_scale *= max_width / widest
+        text_scale = max(0.2, min(text_scale, 1.0))
+
+        # 重新计算尺寸：字高随缩放的变化以 LINE_TEMPLATE 估算
+        max_line_height += text_size(LINE_TEMPLATE, text_scale, thickness)[0][1] - base_height
+
+    # 高度验证
+    max_text_height = height * 0.3
+    if (max_line_height + baseline) * count > max_text_height:
+        text_scale *= max_text_height / ((max_line_height + baseline) * count)
+        text_scale = max(0.2, min(text_scale, 1.0))
+
+    # 精确居中定位
+    total_text_height = (max_line_height + baseline) * count - baseline
+    first = (height + total_text_height) // 2
+
+    # 边界保护
+    first = min(height - baseline - 5, max(max_line_height + 5, first))
+
+    return text_scale, max_line_height, first, max_line_height + baseline
+
+
+def layout_text(text_lines, position, max_width=None, thickness=1):
+    """
+    计算多行文本在指定区域内的排版：自动调整字体大小以适应宽度和高度，并居中
+    字体大小和行偏移按 block_layout 缓存，逐行只需查询（同样缓存的）文本尺寸
+    :param position: 区域 (x, y, width, height)
+    :return: (字体缩放比例, 行高, [(文本, x, y), ...])，x, y 为每行文本左下角坐标
+    """
+    x, y, width, height = position
+    if not text_lines:
+        return initial_scale(width, height), 0, []
+
+    # 行高和基线取实际各行的最大值，OpenCV 5 中它们与文本内容有关
+    base = initial_scale(width, height)
+    sizes = [text_size(line, base, thickness) for line in text_lines]
+    widest = max(w for (w, _), _ in sizes)
+    tallest = max(h for (_, h), _ in sizes)
+    descent = max(baseline for _, baseline in sizes)
+    text_scale, line_height, first, pitch = block_layout(
+        width, height, max_width, thickness, len(text_lines), widest, tallest, descent)
+
+    # 逐行水平居中
+    placements = []
+    for idx, line in enumerate(text_lines):
+        text_x = x + (width - text_size(line, text_scale, thickness)[0][0]) // 2
+        text_y = y + first + idx * pitch if line_height > 0 else 0
+        placements.append((line, text_x, text_y))
+
+    return text_scale, line_height, placements
+
+
+def draw_text(image, text_lines, position, max_width=None, color=(0, 0, 0), thickness=1):
+    """
+    在图像上绘制多行文本，排版规则见 layout_text
+    """
+    text_scale, _, placements = layout_text(text_lines, position, max_width, thickness)
+    for line, text_x, text_y in placements:
+        cv2.putText(image, line, (text_x, text_y),
+                    FONT, text_scale, color, thickness, cv2.LINE_AA)
+
+
+class Text:
+    """
+    文本标注，排版在首次使用时计算并保存
+    """
+    def __init__(self, lines, position, max_width=None, color=(0, 0, 0), thickness=1):
+        self.lines = lines
+        self.position = position
+        self.max_width = max_width
+        self.color = color
+        self.thickness = thickness
+        self._layout = None
+
+    @property
+    def layout(self):
+        if self._layout is None:
+            self._layout = layout_text(self.lines, self.position, self.max_width, self.thickness)
+        return self._layout
+
+
+class Overlay:
+    """
+    矢量标注图层：保存网格线、采样框、采样圆和文本等图元，不修改图像像素
+    显示时由Qt按显示分辨率绘制，导出时才光栅化到图像副本上
+    颜色均为OpenCV的BGR顺序，坐标均为原图像素坐标
+    """
+    def __init__(self, lines=None, rects=None, texts=None, circles=None):
+        self.lines = list(lines or [])  # ((x1, y1), (x2, y2), 颜色, 线宽)
+        self.rects = list(rects or [])  # ((x1, y1), (x2, y2), 颜色, 线宽)
+        self.texts = list(texts or [])  # Text
+        self.circles = list(circles or [])  # ((cx, cy), 半径, 颜色, 线宽)
+
+    def __add__(self, other):
+        return Overlay(self.lines + other.lines, self.rects + other.rects, self.texts + other.texts,
+                       self.circles + other.circles)
+
+    def line(self, p1, p2, color, thickness=1):
+        self.lines.append((p1, p2, color, thickness))
+
+    def rect(self, p1, p2, color, thickness=1):
+        self.rects.append((p1, p2, color, thickness))
+
+    def circle(self, center, radius, color, thickness=1):
+        self.circles.append((center, radius, color, thickness))
+
+    def text(self, lines, position, max_width=None, color=(0, 0, 0), thickness=1):
+        self.texts.append(Text(lines, position, max_width, color, thickness))
+
+    def rasterize(self, image, text=True):
+        """
+        将图层绘制到图像副本上（用于保存）
+        :param text: 是否绘制文本
+        :return: 绘制后的新图像
+        """
+        image = image.copy()
+        for p1, p2, color, thickness in self.lines:
+            cv2.line(image, p1, p2, color, thickness)
+        for p1, p2, color, thickness in self.rects:
+            cv2.rectangle(image, p1, p2, color, thickness)
+        for center, radius, color, thickness in self.circles:
+            cv2.circle(image, center, radius, color, thickness)
+        if text:
+            for item in self.texts:
+                text_scale, _, placements = item.layout
+                for line, text_x, text_y in placements:
+                    cv2.putText(image, line, (text_x, text_y),
+                                FONT, text_scale, item.color, item.thickness, cv2.LINE_AA)
+        return image
+
+    def paint(self, painter, scale=1.0, text=True):
+        """
+        使用QPainter按显示分辨率绘制图层
+        :param scale: 原图坐标到绘制坐标的缩放比例
+        :param text: 是否绘制文本
+        """
+        from PySide6.QtCore import QLineF, QPointF, QRectF, Qt
+        from PySide6.QtGui import QColor, QFont, QFontMetricsF, QPen
+        from PySide6.QtWidgets import QStyleOptionGraphicsItem
+
+        # 实际显示比例（在可缩放视图中还需乘以视图变换）
+        lod = scale * QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+
+        def pen(color, thickness):
+            b, g, r = color
+            p = QPen(QColor(r, g, b))
+            # 线宽至少为一个屏幕像素
+            p.setWidthF(max(thickness * scale, scale / lod))
+            return p
+
+        for p1, p2, color, thickness in self.lines:
+            painter.setPen(pen(color, thickness))
+            painter.drawLine(QLineF(p1[0] * scale, p1[1] * scale, p2[0] * scale, p2[1] * scale))
+
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        for (x1, y1), (x2, y2), color, thickness in self.rects:
+            painter.setPen(pen(color, thickness))
+            painter.drawRect(QRectF(x1 * scale, y1 * scale, (x2 - x1) * scale, (y2 - y1) * scale))
+        for (cx, cy), radius, color, thickness in self.circles:
+            painter.setPen(pen(color, thickness))
+            painter.drawEllipse(QPointF(cx * scale, cy * scale), radius * scale, radius * scale)
+
+        if not text:
+            return
+
+        font = QFont()
+        for item in self.texts:
+            text_scale, line_height, placements = item.layout
+
+            # 以Hershey字体的字高换算Qt字体像素大小，过小时无法辨认，直接跳过
+            pixel_size = line_height * lod / 0.72
+            if pixel_size < 4:
+                continue
+            font.setPixelSize(max(1, round(line_height * scale / 0.72)))
+            font.setBold(item.thickness > 1)
+            painter.setFont(font)
+            painter.setPen(pen(item.color, 1))
+            metrics = QFontMetricsF(font)
+
+            x, _, width, _ = item.position
+            center = (x + width / 2) * scale
+            for line, _, text_y in placements:
+                painter.drawText(QPointF(center - metrics.horizontalAdvance(line) / 2, text_y * scale), line)
+
+
+def grid_overlay(grid, thickness=2, mask='square'):
+    """
+    生成网格线和各孔采样区域图层，只取决于网格几何和采样形状
+    :param mask: 采样形状，方形绘制采样框，圆形和圆环绘制采样圆
+    """
+    overlay = Overlay()
+    height, width = grid.height, grid.width
+
+    for i in range(1, grid.rows):
+        y = i * grid.row_height
+        overlay.line((0, y), (width, y), (255, 0, 0), thickness)
+    for j in range(1, grid.cols):
+        x = j * grid.col_width
+        overlay.line((x, 0), (x, height), (255, 0, 0), thickness)
+
+    if mask != 'square':
+        for cx, cy in zip(grid.cx.tolist(), grid.cy.tolist()):
+            overlay.circle((cx, cy), grid.radius, (0, 0, 255), thickness)
+            if mask == 'annulus':
+                overlay.circle((cx, cy), int(grid.radius * ANNULUS_INNER), (0, 0, 255), thickness)
+        return overlay
+
+    for cx, cy in zip(grid.cx, grid.cy):
+        box_tl = (int(cx - grid.sub_w / 2), int(cy - grid.sub_h / 2))
+        box_br = (int(cx + grid.sub_w / 2), int(cy + grid.sub_h / 2))
+        overlay.rect(box_tl, box_br, (0, 0, 255), thickness)
+    return overlay
@@ -0,0 +1,69 @@
+from PySide6.QtCore import QTimer
+
+from modules.overlay import grid_overlay
+from modules.sampler import WellGrid
+
+
+class LivePreview:
+    """
+    参数实时预览
+    拖动滑块时只在已缓存的显示图像上叠加绘制网格和采样区域，
+    参数停止变化一段时间后才对原图做一次完整分析，期间的多次请求合并为一次
+    """
+    def __init__(self, main_window, delay=300):
+        """
+        :param delay: 参数停止变化后等待的时间（毫秒），之后才进行完整分析
+        """
+        self.main_window = main_window
+        self.active = False  # 首次计数后才开启实时预览
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(self.recompute)
+
+    def activate(self):
+        self.active = True
+
+    def stop(self):
+        """
+        关闭实时预览并取消尚未执行的分析
+        """
+        self.active = False
+        self.timer.stop()
+
+    def _ready(self):
+        if not self.active or self.main_window.origin_img is None:
+            return False
+        # 实时采集时由分析线程负责更新
+        camera = getattr(self.main_window, 'camera', None)
+        return not getattr(camera, 'thread_running', False)
+
+    def request(self, *args):
+        """
+        网格参数变化：立即重绘预览，并推迟完整分析
+        """
+        if not self._ready():
+            return
+        self.draw_overlay(self.main_window.origin_img)
+        self.timer.start()
+
+    def schedule(self, *args):
+        """
+        不影响网格的参数（精度、RNA类型）变化：只推迟完整分析
+        """
+        if self._ready():
+            self.timer.start()
+
+    def draw_overlay(self, image):
+        """
+        在显示图像上叠加网格线和采样区域图层，图像本身的缩放结果由 display_image 缓存
+        """
+        mw = self.main_window
+        height, width = image.shape[:2]
+        grid = WellGrid(height, width, mw.rows, mw.cols, mw.r)
+        mw.basic.display_image(image, grid_overlay(grid, mask=mw.mask))
+
+    def recompute(self):
+        if self._ready():
+            self.main_window.algorithm.refresh()
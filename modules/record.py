@@ -1,6 +1,45 @@
 import os
+import glob
 import datetime
 
+import numpy as np
+
+
+# 每次检测的参数记录
+RUN_DTYPE = np.dtype([
+    ('plate_id', 'U64'),        # 孔板编号（GUI保存时为输出目录名）
+    ('timestamp', 'M8[s]'),     # 检测时间
+    ('rna_type', 'U32'),        # RNA类型
+    ('rows', 'i2'),
+    ('cols', 'i2'),
+    ('r', 'f4'),
+    ('precision', 'i1'),
+    ('source', 'U260'),         # 原始图像路径
+    ('mask', 'U8'),             # 采样形状 square/circle
+])
+
+# 每个孔的检测结果，run 为所属检测在 RUN_DTYPE 表中的下标
+WELL_DTYPE = np.dtype([
+    ('run', 'i4'),
+    ('row', 'i2'),
+    ('col', 'i2'),
+    ('avg_gray', 'f4'),
+    ('gray_diff', 'f4'),
+    ('density', 'f8'),
+    ('cx', 'i4'),
+    ('cy', 'i4'),
+    ('start_row', 'i4'),
+    ('end_row', 'i4'),
+    ('start_col', 'i4'),
+    ('end_col', 'i4'),
+    ('median', 'f4'),
+    ('trimmed_mean', 'f4'),
+    ('std', 'f4'),
+    ('min', 'f4'),
+    ('max', 'f4'),
+    ('saturated', 'f4'),
+])
+
 class DataHandler:
 
     def __init__(self, main_window=None):
@@ -55,6 +94,123 @@ class DataHandler:
             # 写入内容
             file.write(content)
 
+
+
+class ResultDataset:
+    """
+    列式检测结果数据集
+    每次写入生成一个 .npz 文件（包含 runs 和 wells 两张结构化数组表），
+    按月份分目录存放在 outputs/dataset/YYYY-MM/ 下，只追加不修改，
+    读取时一次性拼接所有文件，无需逐个打开Excel
+    """
+    def __init__(self, root=os.path.join('outputs', 'dataset')):
+        self.root = root
+
+    @staticmethod
+    def make_run(plate_id, rows, cols, r, precision, rna_type=None, source=None, timestamp=None, mask='square'):
+        """
+        生成一条检测参数记录
+        """
+        timestamp = timestamp or datetime.datetime.now()
+        return np.array([(plate_id, np.datetime64(timestamp, 's'), rna_type or '', rows, cols,
+                          r, precision, source or '', mask)], dtype=RUN_DTYPE)[0]
+
+    @staticmethod
+    def make_wells(sub_image_info, run=0):
+        """
+        将结果表转换为结构化数组
+        """
+        wells = np.zeros(len(sub_image_info), dtype=WELL_DTYPE)
+        wells['run'] = run
+        for name, key in (('row', 'i'), ('col', 'j'), ('avg_gray', 'avg_gray'), ('gray_diff', 'gray_diff'),
+                          ('density', 'density'), ('cx', 'cx'), ('cy', 'cy')):
+            wells[name] = [info[key] for info in sub_image_info]
+        for name in ('median', 'trimmed_mean', 'std', 'min', 'max', 'saturated'):
+            wells[name] = [info.get(name, np.nan) for info in sub_image_info]
+        wells['row'] += 1  # 行列号从1开始
+        wells['col'] += 1
+        boxes = np.array([info['box'] for info in sub_image_info], dtype=np.int32).reshape(-1, 4)
+        for k, name in enumerate(('start_row', 'end_row', 'start_col', 'end_col')):
+            wells[name] = boxes[:, k]
+        return wells
+
+    def append(self, runs, wells, name=None):
+        """
+        写入一批检测结果
+        :param runs: RUN_DTYPE 结构化数组（或单条记录）
+        :param wells: WELL_DTYPE 结构化数组，run 字段为 runs 中的下标
+        :param name: 文件名（不含扩展名），默认使用第一条记录的孔板编号
+        :return: 写入的文件路径
+        """
+        runs = np.atleast_1d(np.asarray(runs, dtype=RUN_DTYPE))
+        month = runs['timestamp'][0].astype(datetime.datetime).strftime('%Y-%m')
+        partition = os.path.join(self.root, month)
+        os.makedirs(partition, exist_ok=True)
+
+        # 数据集只追加不修改：同名文件已存在（如同一秒内的两次批量分析）时加序号
+        stem = os.path.join(partition, name or runs['plate_id'][0])
+        path, k = f"{stem}.npz", 1
+        while os.path.exists(path):
+            path, k = f"{stem}-{k}.npz", k + 1
+        np.savez_compressed(path, runs=runs, wells=np.asarray(wells, dtype=WELL_DTYPE))
+        return path
+
+    def files(self, start=None, end=None):
+        """
+        列出数据集文件，可按月份 'YYYY-MM' 过滤（包含两端）
+        """
+        paths = []
+        for partition in sorted(glob.glob(os.path.join(self.root, '*'))):
+            month = os.path.basename(partition)
+            if (start and month < start) or (end and month > end):
+                continue
+            paths.extend(sorted(glob.glob(os.path.join(partition, '*.npz'))))
+        return paths
+
+    @staticmethod
+    def _upgrade(records, dtype, missing):
+        """
+        将旧版本写入的数据转换为当前的 dtype，缺少的字段记为 missing
+        """
+        if records.dtype == dtype:
+            return records
+        upgraded = np.zeros(len(records), dtype=dtype)
+        for name in dtype.names:
+            upgraded[name] = records[name] if name in records.dtype.names else missing
+        return upgraded
+
+    def load(self, start=None, end=None):
+        """
+        读取数据集
+        :return: (runs, wells)，wells 的 run 字段已重映射为合并后 runs 中的下标
+        """
+        all_runs, all_wells = [], []
+        offset = 0
+        for path in self.files(start, end):
+            with np.load(path) as data:
+                # 旧版本只支持方形采样；缺少的统计字段记为 nan
+                runs = self._upgrade(data['runs'], RUN_DTYPE, 'square')
+                wells = self._upgrade(data['wells'], WELL_DTYPE, np.nan)
+            wells['run'] += offset
+            offset += len(runs)
+            all_runs.append(runs)
+            all_wells.append(wells)
+
+        if not all_runs:
+            return np.zeros(0, dtype=RUN_DTYPE), np.zeros(0, dtype=WELL_DTYPE)
+        return np.concatenate(all_runs), np.concatenate(all_wells)
+
+    def to_dataframe(self, start=None, end=None):
+        """
+        读取数据集并展开为每孔一行的 DataFrame（包含所属检测的参数列）
+        """
+        import pandas as pd
+
+        runs, wells = self.load(start, end)
+        df = pd.DataFrame(wells)
+        run_df = pd.DataFrame(runs)
+        return df.join(run_df, on='run').drop(columns='run')
+
     
 if __name__ == '__main__':
     
@@ -0,0 +1,429 @@
+import functools
+import threading
+import weakref
+
+import cv2
+import numpy as np
+
+
+# 采样形状：方形采样框（积分图）、内切圆、圆环
+MASK_MODES = ('square', 'circle', 'annulus')
+ANNULUS_INNER = 0.5  # 圆环内径与外径之比
+
+TRIM_PROPORTION = 0.1   # 截尾均值两端各去掉的比例
+SATURATION_LEVEL = 255  # 灰度不低于该值的像素视为饱和
+
+# 每个孔的稳健灰度统计量（平均灰度由 gray_means 计算）
+STATS_DTYPE = np.dtype([
+    ('median', np.float64),
+    ('trimmed_mean', np.float64),
+    ('std', np.float64),
+    ('min', np.float64),
+    ('max', np.float64),
+    ('saturated', np.float64),  # 饱和像素比例
+])
+
+
+class WellGrid:
+    """
+    孔板网格几何信息，一次性以数组形式计算所有孔的中心与采样框
+    """
+    def __init__(self, height, width, rows, cols, r):
+        self.height = height
+        self.width = width
+        self.rows = rows
+        self.cols = cols
+        self.r = r
+
+        # 单元格尺寸与采样半径
+        self.row_height = height // rows
+        self.col_width = width // cols
+        self.radius = int(min(self.row_height, self.col_width) * r)
+
+        # 拼接图中每个子图的尺寸
+        self.sub_h = int(self.row_height * 2 * r)
+        self.sub_w = int(self.col_width * 2 * r)
+
+        # 按行优先顺序展开的行列号
+        self.i, self.j = np.divmod(np.arange(rows * cols), cols)
+
+        # 中心坐标
+        self.cx = self.j * self.col_width + self.col_width // 2
+        self.cy = self.i * self.row_height + self.row_height // 2
+
+        # 原图采样框坐标 (start_row, end_row, start_col, end_col)
+        self.boxes = np.stack([
+            np.maximum(self.cy - self.radius, 0),
+            np.minimum(self.cy + self.radius, height),
+            np.maximum(self.cx - self.radius, 0),
+            np.minimum(self.cx + self.radius, width),
+        ], axis=1)
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def box(self, k):
+        """
+        返回第k个孔的采样框 (start_row, end_row, start_col, end_col)
+        """
+        return tuple(int(v) for v in self.boxes[k])
+
+    def crop(self, image, k):
+        """
+        返回第k个孔采样区域的视图（不复制像素）
+        """
+        start_row, end_row, start_col, end_col = self.box(k)
+        return image[start_row:end_row, start_col:end_col]
+
+
+
+def resize_coords(starts, ends, size):
+    """
+    计算把每段 [start, end) 按 cv2.resize（双线性）缩放到 size 个像素时的源坐标
+    :param starts: (M,) 各段起点
+    :param ends: (M,) 各段终点
+    :return: (M*size,) float32 源坐标，空段为 -1（越界，由边界值填充）
+    """
+    starts = np.asarray(starts, dtype=np.float64)[:, None]
+    lengths = np.asarray(ends, dtype=np.float64)[:, None] - starts
+    d = np.arange(size, dtype=np.float64)[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        src = (d + 0.5) * (lengths / size) - 0.5
+    src = np.clip(src, 0, np.maximum(lengths - 1, 0)) + starts
+    src[np.broadcast_to(lengths <= 0, src.shape)] = -1
+    return src.astype(np.float32).ravel()
+
+
+class _PooledBuffer:
+    """
+    缓冲池中一块内存的持有者：由它导出的数组及其所有视图都间接引用它，
+    全部释放后它才被回收，此时缓冲区回到空闲列表
+    """
+    def __init__(self, buffer):
+        self.__array_interface__ = buffer.__array_interface__
+        self._buffer = buffer  # 保持内存有效
+
+
+class MosaicBuilder:
+    """
+    拼接图构建器：把所有孔的采样区域缩放到统一的子图尺寸并按行列拼接，结果写入可复用的缓冲区
+    - 采样框与子图尺寸一致（无需缩放）时，直接以原图上的跨步视图整体复制
+    - 子图较小（孔数多）时，按网格几何缓存坐标映射，每次构建只需一次 cv2.remap
+    - 子图较大时逐孔 cv2.resize，此时逐次调用的开销可以忽略，而 resize 的逐像素速度更快
+    """
+    # 每个子图不超过该像素数时使用 remap
+    REMAP_MAX_PIXELS = 2048
+
+    def __init__(self, pool_size=2):
+        """
+        :param pool_size: 保留的可复用输出缓冲区个数
+        """
+        self.pool_size = pool_size
+        self._key = None
+        self._maps = None
+        self._free = []  # 空闲的缓冲区
+        self._lock = threading.Lock()  # 结果可能在其他线程中释放
+
+    def maps(self, grid):
+        """
+        返回网格对应的定点坐标映射 (map1, map2)，与逐孔 cv2.resize 的采样位置一致
+        """
+        key = (grid.height, grid.width, grid.rows, grid.cols, grid.r)
+        if key != self._key:
+            # 同一列的孔横向采样框相同，同一行的孔纵向采样框相同
+            columns = grid.boxes[:grid.cols]
+            rows = grid.boxes[::grid.cols]
+            map_x = resize_coords(columns[:, 2], columns[:, 3], grid.sub_w)
+            map_y = resize_coords(rows[:, 0], rows[:, 1], grid.sub_h)
+            map_x, map_y = np.meshgrid(map_x, map_y)
+            self._maps = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            self._key = key
+        return self._maps
+
+    def _buffer(self, shape):
+        """
+        从空闲列表中取一个缓冲区复用，没有合适的时新分配
+        返回的数组以 _PooledBuffer 为 base，它和它的所有视图都释放后缓冲区才回到空闲列表
+        """
+        with self._lock:
+            for k, buffer in enumerate(self._free):
+                if buffer.shape == shape:
+                    del self._free[k]
+                    break
+            else:
+                buffer = np.empty(shape, dtype=np.uint8)
+        holder = _PooledBuffer(buffer)
+        weakref.finalize(holder, self._recycle, buffer)
+        return np.asarray(holder)
+
+    def _recycle(self, buffer):
+        """
+        缓冲区不再被引用时放回空闲列表，只保留最近的 pool_size 个
+        """
+        with self._lock:
+            self._free = (self._free + [buffer])[-self.pool_size:]
+
+    def build(self, image, grid, out=None):
+        """
+        :param image: BGR图像
+        :param grid: WellGrid 实例
+        :param out: 输出缓冲区，形状为 (sub_h*rows, sub_w*cols, 3)，缺省时从缓冲池中复用
+        :return: 拼接图
+        """
+        sub_h, sub_w = grid.sub_h, grid.sub_w
+        shape = (sub_h * grid.rows, sub_w * grid.cols) + image.shape[2:]
+        if out is None:
+            out = self._buffer(shape)
+        if out.size == 0:
+            return out
+
+        boxes = grid.boxes
+        if (np.all(boxes[:, 1] - boxes[:, 0] == sub_h) and np.all(boxes[:, 3] - boxes[:, 2] == sub_w)
+                and image.dtype == np.uint8):
+            # 无需缩放：各孔采样框等间距排列，可表示为原图上的一个跨步视图
+            y0, x0 = int(boxes[0, 0]), int(boxes[0, 2])
+            s0, s1 = image.strides[:2]
+            view = np.lib.stride_tricks.as_strided(
+                image[y0:, x0:],
+                shape=(grid.rows, sub_h, grid.cols, sub_w) + image.shape[2:],
+                strides=(grid.row_height * s0, s0, grid.col_width * s1, s1) + image.strides[2:],
+                writeable=False)
+            np.copyto(out.reshape(view.shape), view)
+            return out
+
+        if sub_h * sub_w <= self.REMAP_MAX_PIXELS:
+            map1, map2 = self.maps(grid)
+            cv2.remap(image, map1, map2, cv2.INTER_LINEAR, dst=out,
+                      borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+            return out
+
+        for k, (i, j) in enumerate(zip(grid.i, grid.j)):
+            cell = out[i * sub_h:(i + 1) * sub_h, j * sub_w:(j + 1) * sub_w]
+            crop = grid.crop(image, k)
+            if crop.size:
+                cv2.resize(crop, (sub_w, sub_h), dst=cell)
+            else:
+                cell[:] = 255
+        return out
+
+
+def box_sums(integral, boxes):
+    """
+    基于积分图（summed-area table）一次性计算所有矩形区域的像素和
+    :param integral: cv2.integral 得到的积分图
+    :param boxes: (N, 4) 数组，每行为 (start_row, end_row, start_col, end_col)
+    :return: (sums, areas) 两个 (N,) 数组
+    """
+    y0, y1, x0, x1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    sums = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    areas = (y1 - y0) * (x1 - x0)
+    return sums, areas
+
+
+def box_means(gray, boxes):
+    """
+    基于积分图一次性计算所有采样框的平均灰度
+    :param gray: 单通道灰度图
+    :param boxes: (N, 4) 数组，每行为 (start_row, end_row, start_col, end_col)
+    :return: (N,) 平均灰度数组，空采样框为 nan
+    """
+    # 使用64位浮点积分图，避免大图累加溢出
+    integral = cv2.integral(gray, sdepth=cv2.CV_64F)
+    sums, areas = box_sums(integral, boxes)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / areas
+
+
+def _radial_dist2(radius):
+    """
+    采样框（边长 2*radius）内各像素中心到孔中心距离的平方
+    """
+    t = np.arange(2 * radius) + 0.5 - radius
+    return t[:, None] ** 2 + t[None, :] ** 2
+
+
+@functools.lru_cache(maxsize=32)
+def mask_template(radius, mask='circle', inner=ANNULUS_INNER):
+    """
+    采样框（边长 2*radius）内的圆形或圆环掩膜，只取决于半径，所有孔共用
+    以像素中心到孔中心的距离判断，掩膜的每一行都由连续像素段组成：
+    圆形为每行一段；圆环为外圆各段（权重 +1）减去内圆各段（权重 -1）
+    :return: (dy, start, end, weight) 四个数组，每项为一行中的一段 [start, end)
+    """
+    dist2 = _radial_dist2(radius)
+
+    def runs(inside, weight):
+        length = inside.sum(axis=1)
+        start = np.where(length > 0, inside.argmax(axis=1), 0) if inside.size else length
+        return np.arange(len(inside)), start, start + length, np.full(len(inside), weight)
+
+    parts = [runs(dist2 <= radius ** 2, 1)]
+    if mask == 'annulus':
+        parts.append(runs(dist2 < (inner * radius) ** 2, -1))
+    template = tuple(np.concatenate(arrays) for arrays in zip(*parts))
+    for array in template:
+        array.flags.writeable = False
+    return template
+
+
+def masked_means(gray, grid, mask='circle'):
+    """
+    一次性计算所有孔掩膜内的平均灰度
+    掩膜模板的每个像素段视为高度为1的矩形，与方形采样共用同一张积分图，
+    每个孔只需按模板查表求和，开销与孔内像素数无关
+    :param gray: 单通道灰度图
+    :return: (N,) 平均灰度数组，掩膜内没有像素的孔为 nan
+    """
+    height, width = gray.shape[:2]
+    dy, start, end, weight = mask_template(grid.radius, mask)
+
+    # (孔数, 段数) 个矩形，超出图像的部分裁掉
+    top = (grid.cy - grid.radius)[:, None] + dy[None, :]
+    left = (grid.cx - grid.radius)[:, None]
+    boxes = np.stack([
+        np.clip(top, 0, height),
+        np.clip(top + 1, 0, height),
+        np.clip(left + start[None, :], 0, width),
+        np.clip(left + end[None, :], 0, width),
+    ], axis=-1).reshape(-1, 4)
+
+    integral = cv2.integral(gray, sdepth=cv2.CV_64F)
+    sums, areas = box_sums(integral, boxes)
+    sums = sums.reshape(len(grid), -1) @ weight
+    areas = areas.reshape(len(grid), -1) @ weight
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / areas
+
+
+@functools.lru_cache(maxsize=32)
+def mask_offsets(radius, mask='square', inner=ANNULUS_INNER):
+    """
+    采样框内属于掩膜的像素相对采样框左上角的偏移，所有孔共用
+    :return: (dy, dx)
+    """
+    dist2 = _radial_dist2(radius)
+    inside = np.ones(dist2.shape, dtype=bool)
+    if mask != 'square':
+        inside = dist2 <= radius ** 2
+    if mask == 'annulus':
+        inside &= dist2 >= (inner * radius) ** 2
+    dy, dx = np.nonzero(inside)
+    dy.flags.writeable = dx.flags.writeable = False
+    return dy, dx
+
+
+def well_histograms(gray, grid, mask='square', chunk_pixels=1 << 22):
+    """
+    一次性统计所有孔采样区域的灰度直方图
+    按掩膜偏移取出各孔像素后，以 (孔序号, 灰度) 为键做一次 np.bincount；
+    孔数很多时按块处理，每块最多约 chunk_pixels 个像素，限制临时内存
+    :param gray: 单通道 uint8 灰度图
+    :return: (N, 256) 每个孔的直方图
+    """
+    height, width = gray.shape[:2]
+    dy, dx = mask_offsets(grid.radius, mask)
+    flat = gray.reshape(-1)
+    hist = np.zeros((len(grid), 256), dtype=np.int64)
+    if len(dy) == 0:
+        return hist
+
+    top = grid.cy - grid.radius
+    left = grid.cx - grid.radius
+    inside = (top >= 0) & (top + 2 * grid.radius <= height) & (left >= 0) & (left + 2 * grid.radius <= width)
+
+    # 采样框完全在图像内的孔：像素位置 = 采样框左上角 + 模板偏移
+    wells = np.flatnonzero(inside)
+    offsets = dy * width + dx
+    step = max(1, chunk_pixels // len(dy))
+    for k in range(0, len(wells), step):
+        chunk = wells[k:k + step]
+        keys = flat[(top[chunk] * width + left[chunk])[:, None] + offsets[None, :]].astype(np.intp)
+        keys += np.arange(len(chunk))[:, None] * 256
+        hist[chunk] = np.bincount(keys.ravel(), minlength=len(chunk) * 256).reshape(-1, 256)
+
+    # 采样框超出图像的孔（只在采样半径超过半个单元格时出现）：去掉图像外的像素
+    wells = np.flatnonzero(~inside)
+    if len(wells):
+        y = top[wells][:, None] + dy[None, :]
+        x = left[wells][:, None] + dx[None, :]
+        valid = (y >= 0) & (y < height) & (x >= 0) & (x < width)
+        labels = np.broadcast_to(np.arange(len(wells))[:, None], y.shape)[valid]
+        keys = labels * 256 + flat[(y * width + x)[valid]]
+        hist[wells] = np.bincount(keys, minlength=len(wells) * 256).reshape(-1, 256)
+    return hist
+
+
+def histogram_stats(hist, trim=TRIM_PROPORTION, saturation=SATURATION_LEVEL):
+    """
+    由各孔灰度直方图按数组一次性计算统计量
+    中位数和截尾均值由累计直方图得到各顺序统计量，与对像素排序后计算的结果一致
+    :param hist: (N, 256) 直方图
+    :param trim: 截尾均值两端各去掉的比例（与 scipy.stats.trim_mean 相同）
+    :param saturation: 饱和灰度阈值
+    :return: STATS_DTYPE 结构化数组，没有像素的孔各项为 nan
+    """
+    levels = np.arange(hist.shape[1])
+    count = hist.sum(axis=1)
+    stats = np.zeros(len(hist), dtype=STATS_DTYPE)
+
+    # 首列补0：below[:, v] 为灰度小于 v 的像素数，below_sum[:, v] 为这些像素的灰度和
+    zeros = np.zeros((len(hist), 1), dtype=np.int64)
+    below = np.hstack([zeros, hist.cumsum(axis=1)])
+    below_sum = np.hstack([zeros, (hist * levels).cumsum(axis=1)])
+
+    def order(k):
+        # 升序排列后第 k 个（从0开始）像素的灰度
+        return (below[:, 1:] <= k[:, None]).sum(axis=1)
+
+    def smallest_sum(k):
+        # 最小的 k 个像素的灰度和
+        v = order(k)
+        v_below = np.take_along_axis(below, v[:, None], axis=1)[:, 0]
+        v_sum = np.take_along_axis(below_sum, v[:, None], axis=1)[:, 0]
+        return v_sum + (k - v_below) * v
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = below_sum[:, -1] / count
+        stats['std'] = np.sqrt((hist * (levels[None, :] - mean[:, None]) ** 2).sum(axis=1) / count)
+        stats['median'] = (order((count - 1) // 2) + order(count // 2)) / 2
+
+        cut = (trim * count).astype(np.int64)
+        stats['trimmed_mean'] = (smallest_sum(count - cut) - smallest_sum(cut)) / (count - 2 * cut)
+
+        present = hist > 0
+        stats['min'] = present.argmax(axis=1)
+        stats['max'] = levels[-1] - present[:, ::-1].argmax(axis=1)
+        stats['saturated'] = hist[:, saturation:].sum(axis=1) / count
+
+    empty = count == 0
+    for name in STATS_DTYPE.names:
+        stats[name][empty] = np.nan
+    return stats
+
+
+def gray_means(gray, grid, mask='square'):
+    """
+    计算所有孔的平均灰度：方形按采样框，圆形和圆环按预先计算的掩膜模板，均基于积分图
+    :param gray: 单通道灰度图
+    :param grid: WellGrid 实例
+    :param mask: 采样形状，见 MASK_MODES
+    :return: (N,) 平均灰度数组
+    """
+    if mask not in MASK_MODES:
+        raise ValueError(f"未知的采样形状: {mask}")
+    if mask == 'square':
+        return box_means(gray, grid.boxes)
+    return masked_means(gray, grid, mask)
+
+
+def gray_stats(gray, grid, mask='square'):
+    """
+    计算所有孔的稳健统计量，需要取出孔内全部像素，开销高于 gray_means
+    :param gray: 单通道 uint8 灰度图
+    :return: STATS_DTYPE 结构化数组
+    """
+    if mask not in MASK_MODES:
+        raise ValueError(f"未知的采样形状: {mask}")
+    return histogram_stats(well_histograms(gray, grid, mask))
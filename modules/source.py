@@ -0,0 +1,258 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from modules.analysis import read_image
+
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+TIFF_EXTS = ('.tif', '.tiff')
+
+
+class FrameSource:
+    """
+    帧来源基类
+    后台线程负责读取和解码，结果放入有界队列，read() 接口与 cv2.VideoCapture 一致，
+    可直接替换相机对象使用；pause() 停止后台读取，再次 read() 时从暂停处继续
+    """
+    # 队列满时是否丢弃最旧的帧（实时相机为 True，文件类来源为 False 以保证不丢帧）
+    drop_when_full = False
+
+    def __init__(self, queue_size=4, fps=None):
+        """
+        :param queue_size: 预取队列长度
+        :param fps: 文件类来源的回放帧率，为 None 时以最快速度读取
+        """
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.fps = fps
+        self._stop = threading.Event()
+        self._thread = None
+        self._finished = False
+        self._frames = None  # frames() 生成器，暂停后继续使用
+        self._pending = None  # 已读取但尚未放入队列的帧
+
+    def frames(self):
+        """
+        子类实现：依次产出BGR帧
+        """
+        raise NotImplementedError
+
+    def isOpened(self):
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._prefetch, daemon=True)
+            self._thread.start()
+
+    def pause(self):
+        """
+        停止后台读取，来源保持可用
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.drop_when_full:
+            # 实时来源暂停前积压的帧已经过时
+            while not self.queue.empty():
+                self.queue.get_nowait()
+
+    def _put(self, item):
+        """
+        放入队列，暂停时放弃
+        :return: 是否已放入
+        """
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self.drop_when_full:
+                    try:
+                        self.queue.get_nowait()  # 丢弃最旧的帧
+                    except queue.Empty:
+                        pass
+        return False
+
+    def _prefetch(self):
+        if self._frames is None:
+            self._frames = self.frames()
+        interval = 1.0 / self.fps if self.fps else 0
+        next_time = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if self._pending is None:
+                    self._pending = next(self._frames, None)
+                    if self._pending is None:
+                        break
+                    if interval:
+                        next_time += interval
+                        delay = next_time - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                if self._put(self._pending):
+                    self._pending = None
+            else:
+                return  # 暂停：保留生成器和未入队的帧
+        except Exception as e:
+            print(f"帧读取失败: {e}")
+        self._put(None)  # 结束标记
+
+    def read(self, timeout=None):
+        """
+        读取下一帧
+        :return: (是否成功, 帧)，来源结束或超时时返回 (False, None)
+        """
+        if self._finished:
+            return False, None
+        self.start()
+        try:
+            frame = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return False, None
+        if frame is None:
+            self._finished = True
+            return False, None
+        return True, frame
+
+    def release(self):
+        self.pause()
+
+
+class CameraSource(FrameSource):
+    """
+    相机来源，预取队列满时丢弃旧帧以保证低延迟，暂停时关闭设备，恢复时重新打开
+    """
+    drop_when_full = True
+
+    def __init__(self, index=0, queue_size=2):
+        super().__init__(queue_size)
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+        self._opened = self.cap.isOpened()
+
+    def isOpened(self):
+        return self._opened
+
+    def start(self):
+        if self._thread is None and self._opened and not self.cap.isOpened():
+            self.cap.open(self.index)
+        super().start()
+
+    def pause(self):
+        super().pause()
+        self.cap.release()
+
+    def frames(self):
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            yield frame
+
+
+class VideoFileSource(FrameSource):
+    """
+    视频文件来源
+    """
+    def __init__(self, path, queue_size=4, fps=None, loop=False):
+        super().__init__(queue_size, fps)
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def frames(self):
+        while True:
+            produced = False
+            ret, frame = self.cap.read()
+            while ret:
+                produced = True
+                yield frame
+                ret, frame = self.cap.read()
+            # 一整遍都没有读到帧时停止循环，避免空转
+            if not (self.loop and produced):
+                break
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+
+class ImageFolderSource(FrameSource):
+    """
+    图像序列来源，按文件名顺序读取目录中的图像
+    """
+    def __init__(self, folder, queue_size=4, fps=None, loop=False):
+        super().__init__(queue_size, fps)
+        self.loop = loop
+        self.paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                      if name.lower().endswith(IMAGE_EXTS)]
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def frames(self):
+        while True:
+            produced = False
+            for path in self.paths:
+                frame = read_image(path)
+                if frame is None:
+                    print(f"跳过无法读取的图像: {path}")
+                    continue
+                produced = True
+                yield frame
+            # 一整遍都没有读到图像时停止循环，避免空转
+            if not (self.loop and produced):
+                break
+
+
+class TiffSource(FrameSource):
+    """
+    多页TIFF来源，每页作为一帧，逐页解码以免整个文件同时驻留内存
+    """
+    def __init__(self, path, queue_size=4, fps=None, loop=False):
+        super().__init__(queue_size, fps)
+        self.path = path
+        self.loop = loop
+
+    def isOpened(self):
+        return os.path.exists(self.path)
+
+    def frames(self):
+        count = cv2.imcount(self.path)
+        while True:
+            produced = False
+            for k in range(count):
+                ret, pages = cv2.imreadmulti(self.path, start=k, count=1, flags=cv2.IMREAD_COLOR)
+                if not ret or not pages:
+                    print(f"跳过无法读取的页: {self.path} 第{k + 1}页")
+                    continue
+                produced = True
+                yield pages[0]
+            # 一整遍都没有读到页时停止循环，避免空转
+            if not (self.loop and produced):
+                break
+
+
+def open_source(spec, **kwargs):
+    """
+    根据描述创建帧来源
+    :param spec: 相机编号（整数或数字字符串）、图像目录、多页TIFF或视频文件路径
+    :param kwargs: 传递给对应来源的参数，如 fps、loop、queue_size
+    """
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return CameraSource(int(spec), **kwargs)
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, **kwargs)
+    if spec.lower().endswith(TIFF_EXTS):
+        return TiffSource(spec, **kwargs)
+    return VideoFileSource(spec, **kwargs)
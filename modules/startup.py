@@ -0,0 +1,39 @@
+import time
+
+
+class StartupProfiler:
+    """
+    启动耗时统计，按阶段记录从进程启动到首帧显示的时间
+    """
+    def __init__(self, t0=None, budget=1.0):
+        """
+        :param t0: 计时起点（time.perf_counter()），默认为创建时刻
+        :param budget: 启动耗时预算（秒），超出时在报告中提示
+        """
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.last = self.t0
+        self.budget = budget
+        self.records = []
+
+    def mark(self, name):
+        """
+        记录上一个标记点到当前时刻的阶段耗时
+        """
+        now = time.perf_counter()
+        self.records.append((name, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.t0
+
+    def report(self):
+        """
+        打印启动耗时报告
+        """
+        print("启动耗时报告:")
+        for name, elapsed in self.records:
+            print(f"  {elapsed * 1000:8.1f} ms  {name}")
+        total = self.total()
+        print(f"  {total * 1000:8.1f} ms  总计")
+        if total > self.budget:
+            print(f"  警告: 启动耗时超过 {self.budget:.1f}s 预算")
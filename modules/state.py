@@ -0,0 +1,48 @@
+import threading
+
+
+def freeze(image):
+    """
+    将图像标记为只读，之后任何原地修改都会抛出异常
+    """
+    if image is not None:
+        image.flags.writeable = False
+    return image
+
+
+class ImageStore:
+    """
+    线程安全的图像状态存储，替代散落在主窗口上的 origin_img / result_img 属性
+
+    - 每个图像槽保存 (版本号, 只读图像)，写入时整体原子替换，读者不会读到写了一半的帧
+    - 图像一经存入即不可修改，读者无需防御性复制；需要修改时复制后 set() 新图像
+    - 被替换的旧帧由Python引用计数管理，仍在使用它的读者不受影响，最后一个引用释放后回收
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}  # 名称 -> (版本号, 图像)
+        self._version = 0
+
+    def set(self, name, image):
+        """
+        原子替换图像槽内容
+        :return: 新版本号
+        """
+        freeze(image)
+        with self._lock:
+            self._version += 1
+            self._frames[name] = (self._version, image)
+            return self._version
+
+    def snapshot(self, name):
+        """
+        返回 (版本号, 图像)，未设置时为 (0, None)
+        """
+        with self._lock:
+            return self._frames.get(name, (0, None))
+
+    def get(self, name):
+        return self.snapshot(name)[1]
+
+    def version(self, name):
+        return self.snapshot(name)[0]
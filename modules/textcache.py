@@ -0,0 +1,114 @@
+import functools
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+from modules.analysis import read_image
+
+
+DEFAULT_CACHE_DIR = os.path.join('resources', 'cache')
+
+
+@functools.lru_cache(maxsize=16)
+def get_font(font_path, font_size):
+    """
+    返回缓存的TrueType字体对象，同一字体和字号只打开一次
+    """
+    from PIL import ImageFont
+    return ImageFont.truetype(font_path, font_size, encoding="utf-8")
+
+
+def draw_chinese_text(img, text, font_path, font_size, color):
+    """
+    使用PIL在BGR图像中央绘制中文文本（加粗效果），返回新图像
+    """
+    from PIL import Image, ImageDraw
+
+    img_pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    draw = ImageDraw.Draw(img_pil)
+    font = get_font(font_path, font_size)
+
+    # 获取文本边界框
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+
+    # 计算文本居中位置
+    img_width, img_height = img_pil.size
+    x = (img_width - text_width) // 2
+    y = (img_height - text_height) // 2
+
+    # 手动绘制粗体效果
+    for dx in range(-1, 1):
+        for dy in range(-1, 1):
+            draw.text((x + dx, y + dy), text, font=font, fill=color)
+
+    return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+
+
+class TextRenderCache:
+    """
+    中文文本渲染结果的磁盘缓存
+    以 (背景, 文本, 字体, 字号, 颜色) 为键保存渲染后的图像，命中时只需一次图像解码
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _file_key(self, path):
+        """
+        文件以路径、大小和修改时间作为键，文件变化后缓存自动失效
+        """
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def _cache_path(self, background, text, font_path, font_size, color):
+        if isinstance(background, str):
+            background_key = self._file_key(background)
+        else:
+            background_key = hashlib.blake2b(np.ascontiguousarray(background).data, digest_size=16).hexdigest() \
+                + str(background.shape)
+
+        parts = [background_key, text, self._file_key(font_path), str(font_size), str(tuple(color))]
+        digest = hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+        # 使用无压缩的BMP格式，解码只需一次内存拷贝
+        return os.path.join(self.cache_dir, f"{digest}.bmp")
+
+    def render(self, background, text, font_path, font_size, color):
+        """
+        返回绘制了文本的图像
+        :param background: BGR图像或背景图像文件路径（传入路径时缓存命中无需解码背景）
+        """
+        cache_path = self._cache_path(background, text, font_path, font_size, color)
+        if os.path.exists(cache_path):
+            cached = read_image(cache_path)
+            if cached is not None:
+                return cached
+
+        if isinstance(background, str):
+            background = read_image(background)
+            if background is None:
+                raise FileNotFoundError("背景图像读取失败")
+
+        img = draw_chinese_text(background, text, font_path, font_size, color)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            ok, buffer = cv2.imencode('.bmp', img)
+            if ok:
+                buffer.tofile(cache_path)
+        except OSError as e:
+            print(f"文本渲染缓存写入失败: {e}")
+
+        return img
+
+
+_cache = TextRenderCache()
+
+
+def render_text(background, text, font_path, font_size, color):
+    """
+    使用共享的磁盘缓存渲染中文文本，详见 TextRenderCache.render
+    """
+    return _cache.render(background, text, font_path, font_size, color)
@@ -0,0 +1,149 @@
+import collections
+import math
+
+import cv2
+import numpy as np
+
+from PySide6.QtCore import QRectF, Qt
+from PySide6.QtGui import QImage, QPainter, QPixmap
+from PySide6.QtWidgets import QGraphicsItem, QGraphicsScene, QGraphicsView, QStyleOptionGraphicsItem
+
+
+TILE_SIZE = 256
+
+
+class ImagePyramid:
+    """
+    图像金字塔，第0层为原图，每上一层尺寸减半，各层在首次使用时才生成
+    """
+    def __init__(self, image, min_size=TILE_SIZE):
+        self.levels = [image]
+        height, width = image.shape[:2]
+        self.count = 1 + max(0, int(math.ceil(math.log2(max(height, width) / min_size))))
+
+    def level(self, k):
+        k = min(k, self.count - 1)
+        while len(self.levels) <= k:
+            prev = self.levels[-1]
+            h, w = prev.shape[:2]
+            self.levels.append(cv2.resize(prev, ((w + 1) // 2, (h + 1) // 2), interpolation=cv2.INTER_AREA))
+        return self.levels[k]
+
+
+class TiledImageItem(QGraphicsItem):
+    """
+    分块绘制的图像图元
+    按当前缩放比例选择金字塔层级，只生成和上传可见区域的图块，图块以LRU方式缓存
+    """
+    def __init__(self, image, max_tiles=256):
+        super().__init__()
+        self.pyramid = ImagePyramid(image)
+        self.height, self.width = image.shape[:2]
+        self.max_tiles = max_tiles
+        self._tiles = collections.OrderedDict()  # (层级, 行, 列) -> QPixmap
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.width, self.height)
+
+    def _tile(self, level, ty, tx):
+        key = (level, ty, tx)
+        pixmap = self._tiles.get(key)
+        if pixmap is not None:
+            self._tiles.move_to_end(key)
+            return pixmap
+
+        img = self.pyramid.level(level)
+        tile = img[ty * TILE_SIZE:(ty + 1) * TILE_SIZE, tx * TILE_SIZE:(tx + 1) * TILE_SIZE]
+        rgb = np.ascontiguousarray(cv2.cvtColor(tile, cv2.COLOR_BGR2RGB))
+        h, w = rgb.shape[:2]
+        pixmap = QPixmap.fromImage(QImage(rgb.data, w, h, 3 * w, QImage.Format.Format_RGB888))
+
+        self._tiles[key] = pixmap
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return pixmap
+
+    def paint(self, painter, option, widget=None):
+        # 屏幕上一个像素对应的原图像素数决定使用的金字塔层级
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        level = max(0, min(self.pyramid.count - 1, int(math.floor(math.log2(1 / lod))) if lod < 1 else 0))
+        factor = 2 ** level
+        span = TILE_SIZE * factor  # 一个图块覆盖的原图像素数
+
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, lod < 1)
+        for ty in range(int(exposed.top() // span), int(math.ceil(exposed.bottom() / span))):
+            for tx in range(int(exposed.left() // span), int(math.ceil(exposed.right() / span))):
+                pixmap = self._tile(level, ty, tx)
+                target = QRectF(tx * span, ty * span, pixmap.width() * factor, pixmap.height() * factor)
+                painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+
+class OverlayItem(QGraphicsItem):
+    """
+    标注图层图元，以原图像素为坐标，随视图缩放按屏幕分辨率重新绘制
+    """
+    def __init__(self, overlay, width, height, text=True):
+        super().__init__()
+        self.overlay = overlay
+        self.width = width
+        self.height = height
+        self.text = text
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.width, self.height)
+
+    def paint(self, painter, option, widget=None):
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.overlay.paint(painter, 1.0, text=self.text)
+
+
+class TiledImageView(QGraphicsView):
+    """
+    可缩放、平移的大图查看器：滚轮缩放，左键拖动平移，双击恢复适应窗口
+    """
+    def __init__(self, image=None, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.SmartViewportUpdate)
+        self.setBackgroundBrush(Qt.GlobalColor.darkGray)
+        self.item = None
+        if image is not None:
+            self.set_image(image)
+
+    def set_image(self, image, overlay=None, text=True):
+        """
+        :param overlay: 叠加显示的标注图层（modules.overlay.Overlay），可选
+        :param text: 是否显示标注图层中的文本
+        """
+        self.scene().clear()
+        self.item = TiledImageItem(image)
+        self.scene().addItem(self.item)
+        if overlay is not None:
+            self.scene().addItem(OverlayItem(overlay, self.item.width, self.item.height, text))
+        self.scene().setSceneRect(self.item.boundingRect())
+        self.fit()
+
+    def fit(self):
+        if self.item is not None:
+            self.fitInView(self.item, Qt.AspectRatioMode.KeepAspectRatio)
+
+    def wheelEvent(self, event):
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        # 最大放大到单个原图像素占32个屏幕像素
+        if factor > 1 and self.transform().m11() * factor > 32:
+            return
+        self.scale(factor, factor)
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.fit()
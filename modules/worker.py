@@ -0,0 +1,129 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class JobCancelled(Exception):
+    """
+    任务被取消时由 Job.report 抛出，用于中断正在执行的任务函数
+    """
+
+
+class JobSignals(QObject):
+    """
+    任务信号，在后台线程中发出，由界面线程中的槽函数接收
+    """
+    progress = Signal(int, str)  # 进度百分比, 说明
+    finished = Signal(object)    # 任务函数的返回值
+    failed = Signal(str)         # 错误信息
+    cancelled = Signal()
+
+
+class Job(QRunnable):
+    """
+    后台任务，任务函数需接受关键字参数 progress，并在适当位置调用它报告进度，
+    任务被取消后再次报告进度时会抛出 JobCancelled 从而中止执行
+    """
+    def __init__(self, fn, *args, name='', **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)  # 由 JobQueue 持有引用
+
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+        self.signals = JobSignals()
+        self._cancel = threading.Event()
+        self.done = threading.Event()   # 任务函数已结束
+        self.ended = threading.Event()  # run() 已全部执行完，可以释放
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def report(self, percent, text=''):
+        """
+        报告进度，同时作为取消检查点
+        """
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.signals.progress.emit(int(percent), text)
+
+    def run(self):
+        result = error = None
+        cancelled = False
+        try:
+            self.report(0, self.name)
+            result = self.fn(*self.args, progress=self.report, **self.kwargs)
+        except JobCancelled:
+            cancelled = True
+        except Exception as e:
+            print(f"{self.name}失败: {e}")
+            error = str(e)
+        finally:
+            # 先标记结束再发出信号，槽函数中查询到的未完成任务数不包含本任务
+            self.done.set()
+
+        if cancelled:
+            self.signals.cancelled.emit()
+        elif error is not None:
+            self.signals.failed.emit(error)
+        else:
+            self.signals.progress.emit(100, self.name)
+            self.signals.finished.emit(result)
+        self.ended.set()
+
+
+class JobQueue:
+    """
+    后台任务队列，基于独立的 QThreadPool
+    线程数为1时任务按提交顺序依次执行
+    """
+    def __init__(self, max_threads=1):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.jobs = []  # 尚未结束的任务
+
+    def submit(self, fn, *args, name='', on_done=None, on_error=None, on_progress=None, **kwargs):
+        """
+        提交任务
+        :param on_done: 任务完成时在界面线程中以返回值调用
+        :param on_error: 任务失败时在界面线程中以错误信息调用
+        :param on_progress: 进度更新时在界面线程中以 (百分比, 说明) 调用
+        :return: Job，可用于取消
+        """
+        job = Job(fn, *args, name=name, **kwargs)
+        if on_done is not None:
+            job.signals.finished.connect(on_done)
+        if on_error is not None:
+            job.signals.failed.connect(on_error)
+        if on_progress is not None:
+            job.signals.progress.connect(on_progress)
+
+        self.jobs = [j for j in self.jobs if not j.ended.is_set()]
+        self.jobs.append(job)
+        self.pool.start(job)
+        return job
+
+    def pending(self):
+        """
+        尚未结束（排队中或执行中）的任务数
+        """
+        return sum(1 for job in self.jobs if not job.done.is_set())
+
+    def cancel_all(self):
+        """
+        取消所有尚未结束的任务，排队中的任务开始时即结束，执行中的任务在下一个进度检查点结束
+        """
+        for job in self.jobs:
+            job.cancel()
+
+    def wait(self, timeout=-1):
+        """
+        等待所有任务结束
+        :param timeout: 超时（毫秒），-1 表示一直等待
+        """
+        return self.pool.waitForDone(timeout)
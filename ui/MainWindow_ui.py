@@ -265,6 +265,20 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_13 = QHBoxLayout()
         self.horizontalLayout_13.setObjectName(u"horizontalLayout_13")
+        self.mask_label = QLabel(self.widget)
+        self.mask_label.setObjectName(u"mask_label")
+        self.mask_label.setMaximumSize(QSize(77, 53))
+
+        self.horizontalLayout_13.addWidget(self.mask_label)
+
+        self.mask_Box = QComboBox(self.widget)
+        self.mask_Box.addItem("")
+        self.mask_Box.addItem("")
+        self.mask_Box.addItem("")
+        self.mask_Box.setObjectName(u"mask_Box")
+
+        self.horizontalLayout_13.addWidget(self.mask_Box)
+
 
         self.blur_layout.addLayout(self.horizontalLayout_13)
 
@@ -408,6 +422,11 @@ class Ui_MainWindow(object):
         self.cols_label.setText(QCoreApplication.translate("MainWindow", u"0", None))
         self.r_label_2.setText(QCoreApplication.translate("MainWindow", u"\u91c7\u6837\u534a\u5f84\uff1a", None))
         self.r_label.setText(QCoreApplication.translate("MainWindow", u"0", None))
+        self.mask_label.setText(QCoreApplication.translate("MainWindow", u"\u91c7\u6837\u5f62\u72b6\uff1a", None))
+        self.mask_Box.setItemText(0, QCoreApplication.translate("MainWindow", u"\u65b9\u5f62", None))
+        self.mask_Box.setItemText(1, QCoreApplication.translate("MainWindow", u"\u5706\u5f62", None))
+        self.mask_Box.setItemText(2, QCoreApplication.translate("MainWindow", u"\u5706\u73af", None))
+
         self.r_label_3.setText(QCoreApplication.translate("MainWindow", u"\u6709\u6548\u6570\u5b57\uff1a", None))
         self.precision_label.setText(QCoreApplication.translate("MainWindow", u"0", None))
         self.label_11.setText(QCoreApplication.translate("MainWindow", u"\u66f2\u7ebf\u62df\u5408\u53c2\u6570", None))